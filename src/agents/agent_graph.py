@@ -10,23 +10,39 @@ oracle.query_trends.
 
 We wrap the whole graph invocation in a root span so Jaeger shows a neat
 parent/child hierarchy for demo clarity.
+
+Optionally a LangGraph checkpointer (SQLite, see `open_sqlite_checkpointer`)
+persists the state after every node, so a crashed batch can resume a graph
+from its last completed node instead of re-paying for LLM calls.
+
+The state carries typed results (`models.SearchSummary`, `models.TrendResult`,
+`models.ResearchResult`); text is rendered only by `run_graph` at the edge.
 """
 
 from __future__ import annotations
 
-from typing import TypedDict
+import inspect
+import sqlite3
+import time
+from pathlib import Path
+from typing import Optional, TypedDict
 
 from opentelemetry import trace
 from langgraph.graph import StateGraph, END  # type: ignore
 
 from agents.search_agent import SearchAgent
 from agents.db_agent import DatabaseAgent
+from models import RESULT_TYPES, ResearchResult, SearchSummary, TrendResult
 from observability.metrics import (
     REQUEST_COUNTER,
     REQUEST_LATENCY,
     QUERIES_PER_SESSION,
     REVENUE_SAVINGS,
 )
+from observability.kpi import get_kpis
+from services.cache import RESULT_CACHE, normalize_key
+from services.tenancy import QuotaExceededError, RequestContext, current_context, get_accounting, use_context
+from services.warmup import record_query
 
 # Business value placeholder for revenue savings calculation
 ESTIMATED_SAVINGS_PER_SUCCESS_USD = 1.0
@@ -34,16 +50,34 @@ ESTIMATED_SAVINGS_PER_SUCCESS_USD = 1.0
 
 class GraphState(TypedDict, total=False):
     query: str
-    search_summary: str
-    db_lines: str
-    combined: str
+    search: SearchSummary
+    trends: TrendResult
+    result: ResearchResult
+
+
+def open_sqlite_checkpointer(path: str):
+    """Return a LangGraph SqliteSaver backed by `path` (created if missing)."""
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer  # type: ignore
+    from langgraph.checkpoint.sqlite import SqliteSaver  # type: ignore
 
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    # Batch workers share one connection; SqliteSaver serializes access itself.
+    conn = sqlite3.connect(path, check_same_thread=False)
+    # Allow-list our result dataclasses; unregistered types are rejected in strict
+    # msgpack mode. The keyword only exists in langgraph-checkpoint>=4.0.1; older
+    # releases accept these types with the default serde.
+    if "allowed_msgpack_modules" not in inspect.signature(JsonPlusSerializer.__init__).parameters:
+        return SqliteSaver(conn)
+    serde = JsonPlusSerializer(allowed_msgpack_modules=[(cls.__module__, cls.__name__) for cls in RESULT_TYPES])
+    return SqliteSaver(conn, serde=serde)
 
-def build_graph(search_agent: SearchAgent, db_agent: DatabaseAgent):
+
+def build_graph(search_agent: SearchAgent, db_agent: DatabaseAgent, checkpointer=None):
     """Create and compile a LangGraph workflow coordinating both agents.
 
     Each node mutates a portion of the shared state. We keep it intentionally
-    small for tutorial readability.
+    small for tutorial readability. With a `checkpointer`, every invocation
+    must pass a `thread_id` (see `run_graph_result`).
     """
     graph = StateGraph(GraphState)
 
@@ -52,26 +86,31 @@ def build_graph(search_agent: SearchAgent, db_agent: DatabaseAgent):
     def search_node(state: GraphState) -> GraphState:
         query = state.get("query", "")  # type: ignore[index]
         with tracer.start_as_current_span("search_agent.run") as span:
-            summary = search_agent.run(query)
-            span.set_attribute("search.summary.length", len(summary))
-        return {"search_summary": summary}
+            start = time.perf_counter()
+            summary = search_agent.fetch(query)
+            # A summary without a working LLM is degraded: it counts against the stage SLO.
+            get_kpis().observe_stage("search", time.perf_counter() - start, ok=not summary.llm_failed)
+            span.set_attribute("search.summary.length", len(summary.text))
+        return {"search": summary}
 
     def db_node(state: GraphState) -> GraphState:
         query = state.get("query", "")  # type: ignore[index]
         with tracer.start_as_current_span("db_agent.run") as span:
             # For this demo we reuse the user query as a topic.
-            lines = db_agent.run(query)
-            span.set_attribute("db.lines.count", lines.count("\n") + (1 if lines else 0))
-        return {"db_lines": lines}
+            start = time.perf_counter()
+            trends = db_agent.fetch(query)
+            get_kpis().observe_stage("db", time.perf_counter() - start, ok=not trends.fallback)
+            span.set_attribute("db.lines.count", len(trends.rows))
+        return {"trends": trends}
 
     def combine_node(state: GraphState) -> GraphState:
-        combined = (
-            "=== Web Research Summary ===\n"
-            f"{state.get('search_summary','')}\n\n"
-            "=== Oracle Trends ===\n"
-            f"{state.get('db_lines','')}"
+        # No string building here: the typed parts are simply bundled together.
+        result = ResearchResult(
+            query=state.get("query", ""),
+            search=state.get("search") or SearchSummary(text=""),
+            trends=state.get("trends") or TrendResult(),
         )
-        return {"combined": combined}
+        return {"result": result}
 
     # Register nodes.
     graph.add_node("search", search_node)
@@ -84,28 +123,107 @@ def build_graph(search_agent: SearchAgent, db_agent: DatabaseAgent):
     graph.add_edge("db", "combine")
     graph.add_edge("combine", END)
 
-    return graph.compile()
-
-
-def run_graph(workflow, user_query: str) -> str:
-    """Execute the compiled workflow under the root span and return combined result."""
-    QUERIES_PER_SESSION.inc()
+    return graph.compile(checkpointer=checkpointer)
+
+
+def _invoke(workflow, user_query: str, thread_id: Optional[str], span) -> GraphState:
+    """Invoke the graph, resuming or reusing a checkpointed run for `thread_id`."""
+    if thread_id is None:
+        return workflow.invoke({"query": user_query})
+
+    config = {"configurable": {"thread_id": thread_id}}
+    if getattr(workflow, "checkpointer", None) is not None:
+        snapshot = workflow.get_state(config)
+        if snapshot.next:
+            # A previous run stopped mid-graph: continue from the pending node(s).
+            span.set_attribute("graph.resumed_at", ",".join(snapshot.next))
+            return workflow.invoke(None, config)
+        result = snapshot.values.get("result")
+        if result is not None and is_complete(result):
+            span.set_attribute("graph.resumed_at", "completed")
+            return snapshot.values
+        if result is not None:
+            # Answered during an outage (fallbacks): run the thread again from the start.
+            span.set_attribute("graph.rerun_degraded", True)
+    return workflow.invoke({"query": user_query}, config)
+
+
+def is_complete(result: ResearchResult) -> bool:
+    """True unless the answer degraded to a fallback somewhere (not cached, re-run by batches)."""
+    search = result.search
+    degraded = search.llm_failed or search.search_failed or search.partial or search.failed_sources
+    return not (degraded or result.trends.fallback)
+
+
+def run_graph_result(
+    workflow,
+    user_query: str,
+    thread_id: Optional[str] = None,
+    context: Optional[RequestContext] = None,
+) -> ResearchResult:
+    """Execute the compiled workflow under the root span and return the typed result.
+
+    `thread_id` keys the checkpoint of a checkpointed workflow. `context`
+    (tenant, session) is made current for the whole run so services can
+    attribute spend; it defaults to the caller's context. Raises
+    `QuotaExceededError` before any work if the tenant is over budget.
+    """
+    ctx = context or current_context()
+    accounting = get_accounting()
     outcome = "success"
-    
-    with REQUEST_LATENCY.time():
+    start = time.perf_counter()
+
+    with use_context(ctx), REQUEST_LATENCY.time():
         try:
+            accounting.check_quota(ctx.tenant)
+            QUERIES_PER_SESSION.inc()
+            record_query(user_query)  # Feeds the hot-query warm-up at the next startup.
+
             tracer = trace.get_tracer(__name__)
             with tracer.start_as_current_span("root_agent.handle_request") as span:
                 span.set_attribute("user.query", user_query)
-                final_state: GraphState = workflow.invoke({"query": user_query})
-                combined = final_state.get("combined", "")
-                span.set_attribute("response.length", len(combined))
-                span.set_attribute("response.lines", combined.count("\n") + (1 if combined else 0))
-            
+                span.set_attribute("tenant.id", ctx.tenant)
+                if ctx.session_id:
+                    span.set_attribute("session.id", ctx.session_id)
+                if thread_id is None:
+                    loaded = []
+
+                    def load() -> ResearchResult:
+                        loaded.append(True)
+                        return _invoke(workflow, user_query, None, span)["result"]
+
+                    # Whole answers are cached too; stale ones are refreshed in the background.
+                    result = RESULT_CACHE.get_or_load(
+                        normalize_key(user_query),
+                        load,
+                        should_cache=is_complete,
+                        refresher=lambda: workflow.invoke({"query": user_query})["result"],
+                    )
+                    span.set_attribute("response.cache_hit", not loaded)
+                else:
+                    # Checkpointed runs (batch) always go through the graph.
+                    result = _invoke(workflow, user_query, thread_id, span)["result"]
+                span.set_attribute("response.summary_length", len(result.search.text))
+                span.set_attribute("response.lines", len(result.trends.rows))
+                span.set_attribute("response.sources", len(result.search.sources))
+                span.set_attribute("response.db_fallback", result.trends.fallback)
+
             REVENUE_SAVINGS.inc(ESTIMATED_SAVINGS_PER_SUCCESS_USD)
-            return combined
+            return result
+        except QuotaExceededError:
+            outcome = "rejected"
+            raise
         except Exception:
             outcome = "error"
             raise
         finally:
+            elapsed = time.perf_counter() - start
             REQUEST_COUNTER.labels(outcome=outcome).inc()
+            accounting.record_request(ctx, elapsed, outcome)
+            if outcome != "rejected":  # Deliberate rejections don't burn the latency SLO.
+                get_kpis().observe_request(elapsed, ok=outcome == "success")
+
+
+def run_graph(workflow, user_query: str) -> str:
+    """Execute the compiled workflow and return the combined text answer."""
+    return run_graph_result(workflow, user_query).render_text()
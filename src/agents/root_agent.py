@@ -6,6 +6,7 @@ from opentelemetry import trace
 
 from agents.search_agent import SearchAgent
 from agents.db_agent import DatabaseAgent
+from models import ResearchResult, SearchSummary, TrendResult
 from observability.metrics import REQUEST_COUNTER, REQUEST_LATENCY
 
 
@@ -26,10 +27,10 @@ class RootAgent:
             with REQUEST_LATENCY.time():
                 outcome = "success"
                 try:
-                    search_results = self._search_agent.run(user_query)
-                    db_results = self._db_agent.run(user_query)
+                    search_results = self._search_agent.fetch(user_query)
+                    db_results = self._db_agent.fetch(user_query)
 
-                    combined = self._combine_results(search_results, db_results)
+                    combined = self._combine_results(user_query, search_results, db_results)
 
                     span.set_attribute("response.length", len(combined))
                     return combined
@@ -39,11 +40,6 @@ class RootAgent:
                 finally:
                     REQUEST_COUNTER.labels(outcome=outcome).inc()
 
-    def _combine_results(self, search_payload: str, db_payload: str) -> str:
+    def _combine_results(self, query: str, search_payload: SearchSummary, db_payload: TrendResult) -> str:
         """Combine agent outputs before returning to the caller."""
-        return (
-            "=== Web Research Summary ===\n"
-            f"{search_payload}\n\n"
-            "=== Oracle Trends ===\n"
-            f"{db_payload}"
-        )
+        return ResearchResult(query=query, search=search_payload, trends=db_payload).render_text()
@@ -2,27 +2,37 @@
 
 from __future__ import annotations
 
-from typing import Callable
+from typing import Callable, Union
 
 from opentelemetry import trace
 
-from services.web_search import web_search_and_summarize
+from models import SearchSummary
+from services.web_search import research_and_summarize
+
+# Search functions may return the typed summary or plain text (wrapped on the fly).
+SearchFn = Callable[[str], Union[SearchSummary, str]]
 
 
 class SearchAgent:
     """Coordinate the web search workflow with simple dependency injection."""
 
-    def __init__(self, search_fn: Callable[[str], str] = web_search_and_summarize):
+    def __init__(self, search_fn: SearchFn = research_and_summarize):
         self._search_fn = search_fn
 
-    def run(self, query: str) -> str:
+    def fetch(self, query: str) -> SearchSummary:
         """Execute the search workflow with OpenTelemetry instrumentation."""
         tracer = trace.get_tracer(__name__)
         with tracer.start_as_current_span("search_agent.run") as span:
             span.set_attribute("query", query)
 
             result = self._search_fn(query)
+            if isinstance(result, str):
+                result = SearchSummary(text=result)
 
-            span.set_attribute("result.length", len(result))
+            span.set_attribute("result.length", len(result.text))
 
             return result
+
+    def run(self, query: str) -> str:
+        """Text-only variant of `fetch`."""
+        return self.fetch(query).text
@@ -2,31 +2,53 @@
 
 from __future__ import annotations
 
+import os
 import warnings
 
 # Suppress the pkg_resources deprecation warning from OpenTelemetry instrumentation
 warnings.filterwarnings("ignore", category=UserWarning, module="opentelemetry.instrumentation.dependencies")
 
-from config import get_settings
+from config import get_settings, install_reload_triggers
+from observability.kpi import get_kpis
 from observability.metrics import init_metrics_server
 from observability.otel_setup import init_tracer, init_http_instrumentation
 from services.db_client import OracleDBClient
+from services.doc_index import get_document_index, local_index_research
+from services.warmup import start_warmup
+from services.web_search import research_and_summarize
 from agents.search_agent import SearchAgent
 from agents.db_agent import DatabaseAgent
 from agents.agent_graph import build_graph, run_graph
 
 
-def build_workflow():
-    """Construct dependencies and compile LangGraph workflow."""
-    _ = get_settings()  # Ensures env is loaded; settings used inside services.
+def build_workflow(checkpointer=None, warm_up: bool = True, db_client=None):
+    """Construct dependencies and compile LangGraph workflow.
+
+    `checkpointer` enables resumable runs (batch mode); `warm_up=False` skips
+    the background cache warm-up. `db_client` replaces the Oracle client
+    (the load generator passes a stub).
+    """
+    settings = get_settings()  # Ensures env is loaded; settings used inside services.
     init_metrics_server()
+    get_kpis()  # Registers the windowed `agentic_kpi_*` collector before the first scrape.
     init_tracer(service_name="agentic-research-demo")
     init_http_instrumentation()
+    # SIGHUP (or a `.env` edit when SETTINGS_WATCH_INTERVAL_S > 0) reloads settings.
+    install_reload_triggers()
+
+    # Incrementally index local research docs (a cheap no-op when nothing changed).
+    if os.path.isdir(settings.research_docs_dir):
+        get_document_index().ingest([settings.research_docs_dir])
 
-    db_client = OracleDBClient()
-    search_agent = SearchAgent()
+    db_client = db_client or OracleDBClient()
+    search_fn = local_index_research if settings.search_backend == "local" else research_and_summarize
+    search_agent = SearchAgent(search_fn=search_fn)
     db_agent = DatabaseAgent(db_client=db_client)
-    workflow = build_graph(search_agent, db_agent)
+    workflow = build_graph(search_agent, db_agent, checkpointer=checkpointer)
+
+    # Pre-execute yesterday's hot queries in the background to fill the caches.
+    if warm_up:
+        start_warmup([search_fn, db_client.query_trends], settings)
     return workflow
 
 
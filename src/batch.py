@@ -0,0 +1,95 @@
+"""Resumable batch runner: sweep a query file through the research graph.
+
+    python src/batch.py queries.jsonl --batch-id nightly
+
+Every query gets a stable key derived from (batch id, position, text). The key
+is used both as the LangGraph checkpoint `thread_id` and as the key in the
+append-only request log. If the process dies halfway through, rerunning the
+same command:
+
+* skips queries whose last log record is `done`,
+* resumes partially finished graphs from their last completed node using the
+  SQLite checkpoints, so LLM calls that were already paid for are not repeated,
+  and
+* re-runs queries logged as `degraded` (answered with an LLM, search or Oracle
+  fallback, e.g. during an outage) from scratch.
+
+The query file may be plain text (one query per line) or JSONL (`query`,
+`title` or `body` field), the same formats the warm-up accepts.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+
+from agents.agent_graph import is_complete, open_sqlite_checkpointer, run_graph_result
+from app import build_workflow
+from services.request_log import RequestLog, load_latest
+from services.tenancy import RequestContext
+from services.warmup import iter_query_file
+
+
+def query_key(batch_id: str, index: int, query: str) -> str:
+    digest = hashlib.sha1(f"{batch_id}\x00{index}\x00{query}".encode("utf-8")).hexdigest()
+    return f"{batch_id}-{digest[:16]}"
+
+
+def run_batch(
+    workflow,
+    queries: Sequence[str],
+    log: RequestLog,
+    batch_id: str,
+    concurrency: int = 4,
+    context: Optional[RequestContext] = None,
+) -> dict:
+    """Run every not-yet-completed query; returns counts per outcome.
+
+    `context` attributes the batch's spend to a tenant (and quota).
+    """
+    latest = load_latest(str(log.path))
+    counts = {"skipped": 0, "done": 0, "degraded": 0, "error": 0}
+
+    def run(index: int, query: str) -> str:
+        key = query_key(batch_id, index, query)
+        if latest.get(key, {}).get("status") == "done":
+            return "skipped"
+        log.append({"key": key, "batch": batch_id, "index": index, "query": query, "status": "started"})
+        try:
+            result = run_graph_result(workflow, query, thread_id=key, context=context)
+        except Exception as exc:
+            log.append({"key": key, "batch": batch_id, "index": index, "status": "error", "error": str(exc)})
+            return "error"
+        status = "done" if is_complete(result) else "degraded"
+        log.append({"key": key, "batch": batch_id, "index": index, "status": status, "result": result.to_dict()})
+        return status
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch") as pool:
+        for outcome in pool.map(lambda item: run(*item), enumerate(queries)):
+            counts[outcome] += 1
+    log.flush()
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Resumable batch sweep over run_graph")
+    parser.add_argument("queries", help="Text or JSONL query file")
+    parser.add_argument("--batch-id", default="batch", help="Stable id; reuse it to resume a batch")
+    parser.add_argument("--log", default="data/batch/requests.log", help="Append-only request/result log")
+    parser.add_argument("--checkpoints", default="data/batch/checkpoints.sqlite", help="LangGraph SQLite checkpoints")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--tenant", default="", help="Tenant to attribute spend to (default: DEFAULT_TENANT)")
+    args = parser.parse_args(argv)
+
+    queries = list(iter_query_file(args.queries))
+    workflow = build_workflow(checkpointer=open_sqlite_checkpointer(args.checkpoints), warm_up=False)
+    context = RequestContext(tenant=args.tenant, session_id=args.batch_id) if args.tenant else None
+    with RequestLog(args.log) as log:
+        counts = run_batch(workflow, queries, log, args.batch_id, args.concurrency, context)
+    print(f"batch '{args.batch_id}': {len(queries)} queries, {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,37 @@
 
 OpenAI is the default LLM provider, but settings remain provider-agnostic so
 other vendors can be swapped in without touching the orchestration code.
+
+`get_settings()` returns a cached, immutable snapshot: the environment is read
+(and decisions such as "is the SQLcl binary on PATH?" are resolved) once, not
+on every request. `reload_settings()` rebuilds the snapshot, swaps it
+atomically and notifies listeners registered with `on_settings_change`, which
+rebuild their clients and pools. It is triggered by SIGHUP or, if
+`SETTINGS_WATCH_INTERVAL_S` > 0, by edits to the `.env` file. Real environment
+variables always win over `.env` values, on the first load and on reloads.
 """
 
 from __future__ import annotations
 
 import os
+import shutil
+import signal
+import threading
+import time
 from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
 
-from dotenv import load_dotenv
+from dotenv import dotenv_values, find_dotenv
 
 _DOTENV_LOADED = False
+# Values we copied from `.env` into os.environ, so a reload can tell them
+# apart from variables the process environment (or a tool) set itself.
+_DOTENV_APPLIED: Dict[str, str] = {}
+
+_SETTINGS: Optional["Settings"] = None
+_SETTINGS_LOCK = threading.Lock()
+_LISTENERS: List[Callable[["Settings", "Settings"], None]] = []
+_TRIGGERS_INSTALLED = False
 
 
 @dataclass(frozen=True)
@@ -21,23 +42,169 @@ class Settings:
     llm_api_key: str
     llm_model: str
     llm_provider: str
+    llm_base_url: str
+    llm_fallback_providers: tuple[str, ...]
     web_search_api_key: str
+    research_sources: tuple[str, ...]
+    research_docs_dir: str
+    doc_index_dir: str
+    search_backend: str
+    retrieval_deadline_s: float
     sqlcl_mcp_endpoint: str
     oracle_user: str
     oracle_password: str
     oracle_dsn: str
     use_sqlcl_mcp: bool
+    cache_ttl_s: float
+    cache_stale_s: float
+    cache_refresh_concurrency: int
+    cache_refresh_jitter_s: float
+    query_stats_path: str
+    warmup_query_log: str
+    warmup_top_n: int
+    warmup_concurrency: int
+    warmup_budget_usd: float
+    warmup_interval_s: float
+    settings_watch_interval_s: float
+    kpi_window_s: float
+    slo_target: float
+    slo_latency_s: tuple[tuple[str, float], ...]
+    default_tenant: str
+    tenant_quota_usd: float
+    tenant_quotas: tuple[tuple[str, float], ...]
+    tenant_quota_window_s: float
+    tenant_label_top_k: int
+    session_idle_s: float
+    # Resolved once per snapshot: path of the SQLcl `sql` binary, "" when unused.
+    sqlcl_executable: str
+
+    @property
+    def db_mode(self) -> str:
+        return "sqlcl" if self.sqlcl_executable else "direct"
 
 
 def _load_environment() -> None:
     """Idempotently load `.env` values for local development."""
     global _DOTENV_LOADED
     if not _DOTENV_LOADED:
-        load_dotenv()
+        _apply_dotenv()
         _DOTENV_LOADED = True
 
 
+def _apply_dotenv() -> None:
+    """Copy `.env` into os.environ without overriding variables set elsewhere.
+
+    A key is (re)written only if it is unset or still holds the value a
+    previous call copied from `.env`; keys deleted from `.env` are dropped.
+    """
+    path = find_dotenv(usecwd=True) or find_dotenv()
+    values = {k: v for k, v in (dotenv_values(path) if path else {}).items() if v is not None}
+    for key, applied in list(_DOTENV_APPLIED.items()):
+        if key not in values and os.environ.get(key) == applied:
+            del os.environ[key]
+        if key not in values:
+            del _DOTENV_APPLIED[key]
+    for key, value in values.items():
+        current = os.environ.get(key)
+        if current is None or current == _DOTENV_APPLIED.get(key):
+            os.environ[key] = value
+            _DOTENV_APPLIED[key] = value
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a numeric env var, falling back to `default` when unset or invalid."""
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _parse_float_pairs(raw: str, lower: bool = True) -> tuple[tuple[str, float], ...]:
+    """Parse `name=number` pairs (e.g. `request=10,llm=5`); malformed entries are skipped."""
+    pairs = []
+    for item in raw.split(","):
+        name, _, value = item.partition("=")
+        name = name.strip().lower() if lower else name.strip()
+        try:
+            pairs.append((name, float(value)))
+        except ValueError:
+            continue
+    return tuple(pair for pair in pairs if pair[0] and pair[1] >= 0)
+
+
 def get_settings() -> Settings:
+    """Return the current settings snapshot (built on first use, then cached)."""
+    global _SETTINGS
+    if _SETTINGS is None:
+        with _SETTINGS_LOCK:
+            if _SETTINGS is None:
+                _SETTINGS = _build_settings()
+    return _SETTINGS
+
+
+def on_settings_change(callback: Callable[[Settings, Settings], None]) -> None:
+    """Register `callback(old, new)` to run after each reload that changed something."""
+    _LISTENERS.append(callback)
+
+
+def reload_settings() -> Settings:
+    """Re-read `.env` + environment and atomically swap the snapshot."""
+    global _SETTINGS
+    with _SETTINGS_LOCK:
+        if _DOTENV_LOADED:
+            _apply_dotenv()
+        old = _SETTINGS
+        new = _build_settings()
+        if new == old:
+            return new
+        _SETTINGS = new
+    if old is not None:
+        for callback in list(_LISTENERS):
+            try:
+                callback(old, new)
+            except Exception:  # pragma: no cover - one bad listener must not block others
+                pass
+    return new
+
+
+def install_reload_triggers() -> None:
+    """Reload on SIGHUP and (optionally) when the `.env` file changes. Idempotent."""
+    global _TRIGGERS_INSTALLED
+    if _TRIGGERS_INSTALLED:
+        return
+    _TRIGGERS_INSTALLED = True
+
+    if hasattr(signal, "SIGHUP"):
+        try:
+            # Reload off the signal handler so we never block on _SETTINGS_LOCK there.
+            signal.signal(
+                signal.SIGHUP,
+                lambda signum, frame: threading.Thread(target=reload_settings, daemon=True).start(),
+            )
+        except ValueError:
+            pass  # Not the main thread (e.g. Streamlit script runner): file watch only.
+
+    interval = get_settings().settings_watch_interval_s
+    dotenv_path = find_dotenv(usecwd=True)
+    if interval <= 0 or not dotenv_path:
+        return
+
+    def watch() -> None:
+        last = None
+        while True:
+            time.sleep(interval)
+            try:
+                mtime = os.stat(dotenv_path).st_mtime_ns
+            except OSError:
+                continue
+            if last is not None and mtime != last:
+                reload_settings()
+            last = mtime
+
+    threading.Thread(target=watch, name="settings-watch", daemon=True).start()
+
+
+def _build_settings() -> Settings:
     """Return strongly-typed settings sourced from environment variables.
 
     This helper is intentionally verbose so a blog reader can follow the flow
@@ -53,22 +220,93 @@ def get_settings() -> Settings:
     llm_api_key = os.getenv("LLM_API_KEY") or os.getenv("OPENAI_API_KEY") or ""
     llm_model = os.getenv("LLM_MODEL") or os.getenv("OPENAI_MODEL") or "gpt-4o-mini"
     llm_provider = os.getenv("LLM_PROVIDER") or "openai"
+    llm_base_url = os.getenv("LLM_BASE_URL", "")
+    # Comma-separated extra backends the router may fail over to, e.g. "ollama:llama3.1,stub".
+    llm_fallback_providers = tuple(
+        p.strip() for p in os.getenv("LLM_FALLBACK_PROVIDERS", "").split(",") if p.strip()
+    )
     web_search_api_key = os.getenv("WEB_SEARCH_API_KEY", "")
+    research_sources = tuple(
+        s.strip().lower() for s in os.getenv("RESEARCH_SOURCES", "duckduckgo,local").split(",") if s.strip()
+    )
+    research_docs_dir = os.getenv("RESEARCH_DOCS_DIR", "data/docs")
+    doc_index_dir = os.getenv("DOC_INDEX_DIR", "data/index")
+    # "web" = retrieval + LLM summary; "local" = BM25 lookup in the local index only.
+    search_backend = os.getenv("SEARCH_BACKEND", "web").lower()
+    retrieval_deadline_s = _env_float("RETRIEVAL_DEADLINE_S", 3.0)
     sqlcl_mcp_endpoint = os.getenv("SQLCL_MCP_ENDPOINT", "http://localhost:1234")
     oracle_user = os.getenv("ORACLE_USER", "SYSTEM")
     oracle_password = os.getenv("ORACLE_PASSWORD", "OraclePassword123")
     oracle_dsn = os.getenv("ORACLE_DSN", "localhost:1521/FREEPDB1")
     use_sqlcl_mcp = os.getenv("USE_SQLCL_MCP", "false").lower() == "true"
 
+    # Stage caches and hot-query warm-up.
+    cache_ttl_s = _env_float("CACHE_TTL_S", 600.0)
+    # Stale-while-revalidate: expired entries are still served for this long while refreshed.
+    cache_stale_s = _env_float("CACHE_STALE_S", 1800.0)
+    cache_refresh_concurrency = max(1, int(_env_float("CACHE_REFRESH_CONCURRENCY", 2)))
+    cache_refresh_jitter_s = _env_float("CACHE_REFRESH_JITTER_S", 5.0)
+    query_stats_path = os.getenv("QUERY_STATS_PATH", "data/query_stats.json")
+    warmup_query_log = os.getenv("WARMUP_QUERY_LOG", "")
+    warmup_top_n = int(_env_float("WARMUP_TOP_N", 10))
+    warmup_concurrency = max(1, int(_env_float("WARMUP_CONCURRENCY", 2)))
+    warmup_budget_usd = _env_float("WARMUP_BUDGET_USD", 0.05)
+    warmup_interval_s = _env_float("WARMUP_INTERVAL_S", 0.0)
+    settings_watch_interval_s = _env_float("SETTINGS_WATCH_INTERVAL_S", 0.0)
+
+    # Windowed KPI aggregation and per-stage latency SLOs, e.g. "request=10,llm=5".
+    kpi_window_s = max(10.0, _env_float("KPI_WINDOW_S", 300.0))
+    slo_target = min(0.9999, max(0.5, _env_float("SLO_TARGET", 0.99)))
+    slo_latency_s = _parse_float_pairs(os.getenv("SLO_LATENCY_S", "request=10,search=4,llm=5,db=2"))
+
+    # Per-tenant accounting: USD quota per window (0 = unlimited), overrides like "acme=5,trial=0.1".
+    default_tenant = os.getenv("DEFAULT_TENANT", "default").strip() or "default"
+    tenant_quota_usd = _env_float("TENANT_QUOTA_USD", 0.0)
+    tenant_quotas = _parse_float_pairs(os.getenv("TENANT_QUOTAS", ""), lower=False)
+    tenant_quota_window_s = max(60.0, _env_float("TENANT_QUOTA_WINDOW_S", 86400.0))
+    tenant_label_top_k = max(1, int(_env_float("TENANT_LABEL_TOP_K", 20)))
+    session_idle_s = _env_float("SESSION_IDLE_S", 1800.0)
+
+    # Resolve the SQLcl binary once here instead of scanning PATH per query.
+    sqlcl_executable = (shutil.which("sql") or "") if use_sqlcl_mcp else ""
+
     # TODO: Add schema validation (e.g., pydantic) once inputs become stricter.
     return Settings(
         llm_api_key=llm_api_key,
         llm_model=llm_model,
         llm_provider=llm_provider,
+        llm_base_url=llm_base_url,
+        llm_fallback_providers=llm_fallback_providers,
         web_search_api_key=web_search_api_key,
+        research_sources=research_sources,
+        research_docs_dir=research_docs_dir,
+        doc_index_dir=doc_index_dir,
+        search_backend=search_backend,
+        retrieval_deadline_s=retrieval_deadline_s,
         sqlcl_mcp_endpoint=sqlcl_mcp_endpoint,
         oracle_user=oracle_user,
         oracle_password=oracle_password,
         oracle_dsn=oracle_dsn,
         use_sqlcl_mcp=use_sqlcl_mcp,
+        cache_ttl_s=cache_ttl_s,
+        cache_stale_s=cache_stale_s,
+        cache_refresh_concurrency=cache_refresh_concurrency,
+        cache_refresh_jitter_s=cache_refresh_jitter_s,
+        query_stats_path=query_stats_path,
+        warmup_query_log=warmup_query_log,
+        warmup_top_n=warmup_top_n,
+        warmup_concurrency=warmup_concurrency,
+        warmup_budget_usd=warmup_budget_usd,
+        warmup_interval_s=warmup_interval_s,
+        settings_watch_interval_s=settings_watch_interval_s,
+        kpi_window_s=kpi_window_s,
+        slo_target=slo_target,
+        slo_latency_s=slo_latency_s,
+        default_tenant=default_tenant,
+        tenant_quota_usd=tenant_quota_usd,
+        tenant_quotas=tenant_quotas,
+        tenant_quota_window_s=tenant_quota_window_s,
+        tenant_label_top_k=tenant_label_top_k,
+        session_idle_s=session_idle_s,
+        sqlcl_executable=sqlcl_executable,
     )
@@ -0,0 +1,314 @@
+"""Open-loop load generator: replay a query file at a target arrival rate.
+
+    python src/loadgen.py requests.jsonl --rate 5 --duration 60 --stub
+    python src/loadgen.py queries.txt --rate 20 --requests 500 --url http://host/research
+
+Arrivals follow a Poisson process: inter-arrival gaps are drawn from an
+exponential distribution with mean `1 / rate`. They are scheduled against the
+wall clock regardless of how many requests are still in flight (open loop).
+Latency is measured from each request's *intended* start time. When the
+service saturates, time spent queueing for a worker therefore shows up in the
+percentiles, instead of being hidden by a closed-loop client that simply
+sends less (coordinated omission). Service time (actual start to finish) is
+reported separately, so queueing delay is the difference between the two.
+
+Targets:
+
+* in-process (default): `build_workflow()` + `run_graph_result()`, the same
+  code path as the CLI and the Streamlit app.
+* HTTP (`--url`): POSTs `{"query": ...}` as JSON; any 2xx response counts as
+  success. Pass `--metrics-url` to diff the service's Prometheus KPIs.
+
+`--stub` (in-process only) swaps the LLM, web retrieval and Oracle backends
+for zero-cost stubs with simulated latency (`--stub-latency-ms`). The real
+pipeline still runs: caches, router, breakers, graph and metrics. This lets
+you find the service's own limits without spending money or hitting
+DuckDuckGo. Add `--no-cache` to measure cold paths.
+
+The report prints HDR-histogram percentiles (see
+`observability/hdr_histogram.py`) next to the change in the Prometheus KPIs
+over the run. `--hdr-out` writes the full percentile distribution for plotting.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from observability.hdr_histogram import HdrHistogram, format_summary
+from services.warmup import iter_query_file
+
+Target = Callable[[str], object]
+SampleKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+@dataclass
+class LoadReport:
+    """Outcome of one load run; latencies in seconds."""
+
+    sent: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    elapsed_s: float = 0.0  # Arrival window: first to last dispatch.
+    wall_s: float = 0.0  # Including the drain of in-flight requests.
+    max_in_flight: int = 0
+    response: HdrHistogram = field(default_factory=HdrHistogram)  # From intended start.
+    service: HdrHistogram = field(default_factory=HdrHistogram)  # From actual start.
+    errors: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def achieved_rate(self) -> float:
+        return self.sent / self.elapsed_s if self.elapsed_s else 0.0
+
+
+def run_load(
+    target: Target,
+    queries: Sequence[str],
+    rate: float,
+    duration_s: Optional[float] = None,
+    max_requests: Optional[int] = None,
+    concurrency: int = 16,
+    seed: Optional[int] = None,
+) -> LoadReport:
+    """Fire `queries` (cycled) at Poisson arrivals of `rate`/s until duration or count is reached."""
+    if rate <= 0:
+        raise ValueError("rate must be > 0")
+    if not queries:
+        raise ValueError("no queries to replay")
+    if duration_s is None and max_requests is None:
+        raise ValueError("set a duration, a request count, or both")
+
+    rng = random.Random(seed)
+    report = LoadReport()
+    lock = threading.Lock()
+    in_flight = [0]
+
+    def one(query: str, intended: float) -> None:
+        started = time.perf_counter()
+        error: Optional[str] = None
+        try:
+            target(query)
+        except Exception as exc:
+            error = type(exc).__name__
+        finished = time.perf_counter()
+        report.response.record(finished - intended)
+        report.service.record(finished - started)
+        with lock:
+            in_flight[0] -= 1
+            if error is None:
+                report.succeeded += 1
+            else:
+                report.failed += 1
+                report.errors[error] = report.errors.get(error, 0) + 1
+
+    start = time.perf_counter()
+    deadline = start + duration_s if duration_s is not None else float("inf")
+    intended = start
+    # Workers beyond `concurrency` queue inside the executor; that wait is measured.
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="loadgen") as pool:
+        while max_requests is None or report.sent < max_requests:
+            intended += rng.expovariate(rate)
+            if intended >= deadline:
+                break
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            with lock:
+                in_flight[0] += 1
+                report.max_in_flight = max(report.max_in_flight, in_flight[0])
+            pool.submit(one, queries[report.sent % len(queries)], intended)
+            report.sent += 1
+        report.elapsed_s = time.perf_counter() - start
+    report.wall_s = time.perf_counter() - start
+    return report
+
+
+# -- targets ----------------------------------------------------------------
+
+
+def http_target(url: str, timeout_s: float = 60.0) -> Target:
+    import requests
+
+    session = requests.Session()
+
+    def call(query: str) -> None:
+        response = session.post(url, json={"query": query}, timeout=timeout_s)
+        response.raise_for_status()
+
+    return call
+
+
+def in_process_target(stub: bool = False, stub_latency_s: float = 0.05, tenant: str = "") -> Target:
+    from agents.agent_graph import run_graph_result
+    from app import build_workflow
+    from services.tenancy import RequestContext
+
+    db_client = install_stub_backends(stub_latency_s) if stub else None
+    workflow = build_workflow(warm_up=False, db_client=db_client)
+    context = RequestContext(tenant=tenant, session_id="loadgen") if tenant else None
+    return lambda query: run_graph_result(workflow, query, context=context)
+
+
+def install_stub_backends(latency_s: float):
+    """Route LLM and web retrieval to stubs; return a stub Oracle client for the graph."""
+    from config import get_settings
+    from models import TrendResult, TrendRow
+    from services.llm_router import LLMRouter, LLMResult, LocalStubProvider, set_llm_router
+    from services.retrieval import Retriever, RetrievalSource, Snippet, set_retriever
+
+    def pause() -> None:
+        if latency_s > 0:
+            time.sleep(random.expovariate(1.0 / latency_s))
+
+    class StubLLM(LocalStubProvider):
+        def complete(self, messages, temperature, max_tokens) -> LLMResult:
+            pause()
+            result = super().complete(messages, temperature, max_tokens)
+            # Rough token counts (~4 chars/token) so tokens-per-query KPIs move.
+            prompt_chars = sum(len(m.get("content", "")) for m in messages)
+            return LLMResult(result.text, self.name, self.model, prompt_chars // 4, len(result.text) // 4)
+
+    class StubSource(RetrievalSource):
+        name = "stub"
+
+        def fetch(self, query: str) -> List[Snippet]:
+            pause()
+            return [
+                Snippet(f"Stub finding {i} about {query}.", self.name, f"https://example.invalid/{i}", f"Stub {i}")
+                for i in range(4)
+            ]
+
+    class StubDBClient:
+        def query_trends(self, topic: str) -> TrendResult:
+            pause()
+            return TrendResult(rows=(TrendRow(2025, "stub trend"), TrendRow(2024, "stub trend")))
+
+    set_llm_router(LLMRouter([StubLLM(name="stub", fallback_only=False)]))
+    set_retriever(Retriever([StubSource()], deadline_s=get_settings().retrieval_deadline_s))
+    return StubDBClient()
+
+
+# -- Prometheus KPIs ------------------------------------------------------------
+
+
+def sample_values(families: Iterable) -> Dict[SampleKey, float]:
+    """Flatten metric families (from `REGISTRY.collect()` or the text parser)."""
+    values: Dict[SampleKey, float] = {}
+    for family in families:
+        for sample in family.samples:
+            values[(sample.name, tuple(sorted(sample.labels.items())))] = sample.value
+    return values
+
+
+def local_samples() -> Dict[SampleKey, float]:
+    from prometheus_client import REGISTRY
+
+    return sample_values(REGISTRY.collect())
+
+
+def remote_samples(url: str) -> Dict[SampleKey, float]:
+    import requests
+    from prometheus_client.parser import text_string_to_metric_families
+
+    response = requests.get(url, timeout=10)
+    response.raise_for_status()
+    return sample_values(text_string_to_metric_families(response.text))
+
+
+def kpi_delta(before: Dict[SampleKey, float], after: Dict[SampleKey, float]) -> Dict[str, float]:
+    """Headline KPIs computed from the counter increase over the run."""
+
+    def total(name: str, **labels: str) -> float:
+        wanted = set(labels.items())
+        return sum(
+            value - before.get(key, 0.0)
+            for key, value in after.items()
+            if key[0] == name and wanted <= set(key[1])
+        )
+
+    ok = total("agentic_requests_total", outcome="success")
+    errors = total("agentic_requests_total", outcome="error")
+    cost = total("agentic_llm_cost_usd_total")
+    tokens = total("agentic_llm_prompt_tokens_total") + total("agentic_llm_completion_tokens_total")
+    hits = total("agentic_cache_requests_total", result="hit") + total("agentic_cache_requests_total", result="stale")
+    lookups = hits + total("agentic_cache_requests_total", result="miss")
+    latency_count = total("agentic_request_latency_seconds_count")
+    return {
+        "requests_success": ok,
+        "requests_error": errors,
+        "error_ratio": errors / (ok + errors) if ok + errors else 0.0,
+        "llm_cost_usd": cost,
+        "cost_per_success_usd": cost / ok if ok else 0.0,
+        "tokens_per_query": tokens / (ok + errors) if ok + errors else 0.0,
+        "cache_hit_ratio": hits / lookups if lookups else 0.0,
+        "breaker_trips": total("agentic_circuit_breaker_trips_total"),
+        "mean_request_latency_s": total("agentic_request_latency_seconds_sum") / latency_count if latency_count else 0.0,
+    }
+
+
+def print_report(report: LoadReport, rate: float, kpis: Optional[Dict[str, float]]) -> None:
+    print("=== Load Report ===")
+    print(
+        f"target rate {rate:.2f}/s, achieved {report.achieved_rate:.2f}/s over {report.elapsed_s:.1f}s "
+        f"(drained after {report.wall_s:.1f}s); "
+        f"sent={report.sent} ok={report.succeeded} failed={report.failed} max_in_flight={report.max_in_flight}"
+    )
+    if report.errors:
+        print("errors: " + ", ".join(f"{name}={count}" for name, count in sorted(report.errors.items())))
+    print(format_summary("response", report.response))
+    print(format_summary("service", report.service))
+    if kpis:
+        print("=== Prometheus KPIs (delta over run) ===")
+        for name, value in kpis.items():
+            print(f"{name:<24} {value:.6g}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Open-loop Poisson load generator for the research graph")
+    parser.add_argument("queries", nargs="?", default="requests.jsonl", help="Text or JSONL query file")
+    parser.add_argument("--rate", type=float, default=1.0, help="Mean arrivals per second")
+    parser.add_argument("--duration", type=float, default=None, help="Seconds to generate load")
+    parser.add_argument("--requests", type=int, default=None, help="Stop after this many requests")
+    parser.add_argument("--concurrency", type=int, default=16, help="Max requests executing at once")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible arrival times")
+    parser.add_argument("--url", default="", help="HTTP endpoint to POST {'query': ...} to (default: in-process)")
+    parser.add_argument("--metrics-url", default="", help="Prometheus endpoint of the HTTP target")
+    parser.add_argument("--stub", action="store_true", help="Stub LLM, web and Oracle backends (in-process)")
+    parser.add_argument("--stub-latency-ms", type=float, default=50.0, help="Mean simulated backend latency")
+    parser.add_argument("--no-cache", action="store_true", help="Disable stage caches (in-process)")
+    parser.add_argument("--tenant", default="", help="Tenant to attribute the load to (in-process)")
+    parser.add_argument("--hdr-out", default="", help="Write the response-time percentile distribution here")
+    args = parser.parse_args(argv)
+    if args.duration is None and args.requests is None:
+        args.duration = 30.0
+
+    queries = list(iter_query_file(args.queries))
+    if args.url:
+        target = http_target(args.url)
+        snapshot = (lambda: remote_samples(args.metrics_url)) if args.metrics_url else None
+    else:
+        if args.no_cache:
+            os.environ["CACHE_TTL_S"] = "0"
+        # Keep synthetic traffic out of the hot-query ranking used by the warm-up.
+        os.environ["QUERY_STATS_PATH"] = ""
+        target = in_process_target(stub=args.stub, stub_latency_s=args.stub_latency_ms / 1000.0, tenant=args.tenant)
+        snapshot = local_samples
+
+    before = snapshot() if snapshot else None
+    report = run_load(target, queries, args.rate, args.duration, args.requests, args.concurrency, args.seed)
+    kpis = kpi_delta(before, snapshot()) if snapshot and before is not None else None
+    print_report(report, args.rate, kpis)
+
+    if args.hdr_out:
+        with open(args.hdr_out, "w", encoding="utf-8") as fh:
+            fh.write(report.response.format_distribution())
+
+
+if __name__ == "__main__":
+    main()
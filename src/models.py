@@ -0,0 +1,117 @@
+"""Typed result objects carried through the LangGraph state.
+
+Services return these immutable, `__slots__`-backed dataclasses instead of
+pre-formatted strings. Every hop (agents, graph nodes, caches, UI) can then
+read fields directly rather than concatenating and re-parsing text. Rendering
+happens only at the edge:
+
+* `ResearchResult.render_text()` for the CLI / `run_graph` string contract
+* `ResearchResult.to_dict()` for JSON API clients
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+
+FALLBACK_MARKER = "(fallback)"
+
+
+@dataclass(frozen=True, slots=True)
+class TrendRow:
+    """One row of `ai_database_trends`; `fallback` marks static demo rows."""
+
+    year: int
+    trend: str
+    fallback: bool = False
+
+    def render(self) -> str:
+        label = f"{FALLBACK_MARKER} {self.trend}" if self.fallback else self.trend
+        return f"{self.year}: {label}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"year": self.year, "trend": self.trend, "fallback": self.fallback}
+
+
+@dataclass(frozen=True, slots=True)
+class TrendResult:
+    """Oracle trend rows for a topic, plus whether they are fallback data."""
+
+    rows: Tuple[TrendRow, ...] = ()
+    fallback: bool = False
+
+    def __post_init__(self) -> None:
+        # Checkpoint deserialization hands tuples back as lists.
+        object.__setattr__(self, "rows", tuple(self.rows))
+
+    def render_text(self) -> str:
+        return "\n".join(row.render() for row in self.rows)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"rows": [row.to_dict() for row in self.rows], "fallback": self.fallback}
+
+
+@dataclass(frozen=True, slots=True)
+class SourceRef:
+    """Where a piece of summarized context came from."""
+
+    source: str
+    url: str = ""
+    title: str = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"source": self.source, "url": self.url, "title": self.title}
+
+
+@dataclass(frozen=True, slots=True)
+class SearchSummary:
+    """LLM (or local) summary with provenance and explicit failure flags."""
+
+    text: str
+    sources: Tuple[SourceRef, ...] = ()
+    provider: str = ""
+    search_failed: bool = False
+    unanswerable: bool = False
+    llm_failed: bool = False
+    partial: bool = False  # Retrieval deadline hit before enough context arrived.
+    failed_sources: Tuple[str, ...] = ()  # Retrieval sources that errored for this query.
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "sources", tuple(self.sources))
+        object.__setattr__(self, "failed_sources", tuple(self.failed_sources))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "text": self.text,
+            "sources": [s.to_dict() for s in self.sources],
+            "provider": self.provider,
+            "search_failed": self.search_failed,
+            "unanswerable": self.unanswerable,
+            "llm_failed": self.llm_failed,
+            "partial": self.partial,
+            "failed_sources": list(self.failed_sources),
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class ResearchResult:
+    """Final answer for one query: web summary + Oracle trends."""
+
+    query: str
+    search: SearchSummary
+    trends: TrendResult
+
+    def render_text(self) -> str:
+        return (
+            "=== Web Research Summary ===\n"
+            f"{self.search.text}\n\n"
+            "=== Oracle Trends ===\n"
+            f"{self.trends.render_text()}"
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"query": self.query, "search": self.search.to_dict(), "trends": self.trends.to_dict()}
+
+
+# Types stored in LangGraph checkpoints; registered with the checkpoint serializer.
+RESULT_TYPES = (TrendRow, TrendResult, SourceRef, SearchSummary, ResearchResult)
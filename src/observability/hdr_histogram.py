@@ -0,0 +1,194 @@
+"""Small HDR-style latency histogram: log-linear buckets, bounded relative error.
+
+Values are recorded as integer microseconds. Buckets are 1µs wide up to a
+few thousand µs and then double in width with every power of two. Any
+recorded value can therefore be read back within `10 ** -significant_digits`
+relative error, while memory stays a fixed array of a few thousand counters
+no matter how many samples arrive.
+
+Compared to a Prometheus `Histogram` with hand-picked buckets, p99 / p99.9 can
+be read back accurately and two histograms merge by adding counts. The load
+generator (`src/loadgen.py`) uses it for its latency report, and
+`observability/kpi.py` keeps rotating windows of them for rolling quantiles.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+class HdrHistogram:
+    """Thread-safe latency histogram; record and query in seconds."""
+
+    def __init__(self, significant_digits: int = 3, max_value_s: float = 3600.0) -> None:
+        if not 1 <= significant_digits <= 5:
+            raise ValueError("significant_digits must be between 1 and 5")
+        self.significant_digits = significant_digits
+        self.max_value_s = max_value_s
+        # Linear sub-buckets per power of two: enough to resolve 10**-digits.
+        self._sub_count = 1 << math.ceil(math.log2(2 * 10**significant_digits))
+        self._sub_bits = self._sub_count.bit_length() - 1
+        self._half = self._sub_count >> 1
+        self._max_value = max(1, int(max_value_s * 1_000_000))
+        self._counts: List[int] = [0] * (self._index(self._max_value) + 1)
+        self._lock = threading.Lock()
+        self._total = 0
+        self._sum = 0
+        self._min = 0
+        self._max = 0
+
+    # -- recording ---------------------------------------------------------
+
+    def record(self, value_s: float, count: int = 1) -> None:
+        """Record a latency in seconds; values above `max_value_s` are clamped."""
+        value = min(max(0, int(round(value_s * 1_000_000))), self._max_value)
+        index = self._index(value)
+        with self._lock:
+            self._counts[index] += count
+            if self._total == 0 or value < self._min:
+                self._min = value
+            self._max = max(self._max, value)
+            self._total += count
+            self._sum += value * count
+
+    def merge(self, other: "HdrHistogram") -> None:
+        """Add another histogram's counts (both must share the same layout)."""
+        if (other.significant_digits, other._max_value) != (self.significant_digits, self._max_value):
+            raise ValueError("cannot merge histograms with different layouts")
+        with other._lock:
+            counts = list(other._counts)
+            total, total_sum, low, high = other._total, other._sum, other._min, other._max
+        if total == 0:
+            return
+        with self._lock:
+            for index, count in enumerate(counts):
+                if count:
+                    self._counts[index] += count
+            if self._total == 0 or low < self._min:
+                self._min = low
+            self._max = max(self._max, high)
+            self._total += total
+            self._sum += total_sum
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = [0] * len(self._counts)
+            self._total = self._sum = self._min = self._max = 0
+
+    def copy(self) -> "HdrHistogram":
+        clone = HdrHistogram(self.significant_digits, self.max_value_s)
+        clone.merge(self)
+        return clone
+
+    # -- queries -----------------------------------------------------------
+
+    @property
+    def count(self) -> int:
+        return self._total
+
+    @property
+    def min(self) -> float:
+        return self._min / 1_000_000
+
+    @property
+    def max(self) -> float:
+        return self._max / 1_000_000
+
+    @property
+    def mean(self) -> float:
+        return self._sum / self._total / 1_000_000 if self._total else 0.0
+
+    def percentile(self, percentile: float) -> float:
+        """Smallest recorded value (seconds) at or above `percentile` of the samples."""
+        return self.percentiles([percentile])[0]
+
+    def percentiles(self, percentiles: Sequence[float]) -> List[float]:
+        with self._lock:
+            counts = list(self._counts)
+            total, low, high = self._total, self._min, self._max
+        if total == 0:
+            return [0.0 for _ in percentiles]
+        results = []
+        for p in percentiles:
+            target = max(1, math.ceil(min(100.0, max(0.0, p)) / 100.0 * total))
+            seen = 0
+            for index, count in enumerate(counts):
+                seen += count
+                if seen >= target:
+                    # Report the bucket's upper edge, clipped to the real extremes.
+                    results.append(min(max(self._highest_equivalent(index), low), high) / 1_000_000)
+                    break
+        return results
+
+    def count_at_or_below(self, value_s: float) -> int:
+        """Samples whose bucket lies entirely at or below `value_s` (SLO "good" events)."""
+        value = min(max(0, int(value_s * 1_000_000)), self._max_value)
+        index = self._index(value)
+        with self._lock:
+            good = sum(self._counts[:index])
+            # The bucket holding `value` only counts if its upper edge is within the limit.
+            if self._highest_equivalent(index) <= value:
+                good += self._counts[index]
+        return good
+
+    def summary(self, percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, float]:
+        """Count, min, mean, requested percentiles and max as a flat dict (seconds)."""
+        values = self.percentiles(percentiles)
+        summary: Dict[str, float] = {"count": float(self.count), "min": self.min, "mean": self.mean}
+        for p, value in zip(percentiles, values):
+            summary[f"p{p:g}"] = value
+        summary["max"] = self.max
+        return summary
+
+    def iter_distribution(self) -> Iterator[Tuple[float, float, int]]:
+        """Yield `(value_s, cumulative_percentile, cumulative_count)` per non-empty bucket."""
+        with self._lock:
+            counts = list(self._counts)
+            total, high = self._total, self._max
+        seen = 0
+        for index, count in enumerate(counts):
+            if count:
+                seen += count
+                yield min(self._highest_equivalent(index), high) / 1_000_000, 100.0 * seen / total, seen
+
+    def format_distribution(self, unit_s: float = 1e-3) -> str:
+        """Percentile distribution in the `.hgrm` text layout (values in `unit_s`, default ms)."""
+        lines = [f"{'Value':>12} {'Percentile':>14} {'TotalCount':>10} {'1/(1-Percentile)':>16}", ""]
+        for value, percentile, seen in self.iter_distribution():
+            fraction = percentile / 100.0
+            inverse = f"{1.0 / (1.0 - fraction):16.2f}" if fraction < 1.0 else f"{'inf':>16}"
+            lines.append(f"{value / unit_s:12.3f} {fraction:14.12f} {seen:10d} {inverse}")
+        lines.append(
+            f"#[Mean = {self.mean / unit_s:.3f}, Max = {self.max / unit_s:.3f}, Total count = {self.count}]"
+        )
+        return "\n".join(lines) + "\n"
+
+    # -- bucket layout -----------------------------------------------------
+
+    def _index(self, value: int) -> int:
+        if value < self._sub_count:
+            return value
+        shift = value.bit_length() - self._sub_bits
+        return self._sub_count + (shift - 1) * self._half + ((value >> shift) - self._half)
+
+    def _highest_equivalent(self, index: int) -> int:
+        if index < self._sub_count:
+            return index
+        shift = (index - self._sub_count) // self._half + 1
+        sub = (index - self._sub_count) % self._half + self._half
+        return ((sub + 1) << shift) - 1
+
+
+def format_summary(name: str, histogram: Optional[HdrHistogram], percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> str:
+    """One human-readable line, e.g. `latency  n=120 p50=41.2ms p99=180.3ms max=201.0ms`."""
+    if histogram is None or histogram.count == 0:
+        return f"{name:<10} n=0"
+    summary = histogram.summary(percentiles)
+    parts = [f"n={histogram.count}", f"mean={summary['mean'] * 1000:.1f}ms"]
+    parts += [f"p{p:g}={summary[f'p{p:g}'] * 1000:.1f}ms" for p in percentiles]
+    parts.append(f"max={summary['max'] * 1000:.1f}ms")
+    return f"{name:<10} " + " ".join(parts)
@@ -0,0 +1,231 @@
+"""In-process, windowed KPI aggregation exported as compact Prometheus gauges.
+
+The raw counters in `metrics.py` are good for totals. But ratios such as cost
+per successful request, tokens per query, rolling percentiles and SLO burn
+otherwise have to be recomputed in PromQL over every raw series on each
+dashboard refresh. `KpiAggregator` keeps a sliding window (`KPI_WINDOW_S`,
+default 5 minutes) of:
+
+* latency per stage (`request`, `search`, `db`, `llm`) as rotating
+  `HdrHistogram` slots, giving rolling p50/p90/p95/p99 without buckets;
+* request outcomes, LLM calls, tokens and USD cost as rotating counters.
+
+`KpiCollector` turns the window into a handful of pre-aggregated
+`agentic_kpi_*` gauges at scrape time. That is a few series per stage instead
+of hundreds of histogram buckets. Recording rules for the raw counters live in
+`docker/prometheus-rules.yml`.
+
+SLO burn rate per stage is `(1 - good/total) / (1 - SLO_TARGET)`, where "good"
+means finished within that stage's `SLO_LATENCY_S` threshold (errors are
+never good). A value above 1 means the stage spends error budget faster than
+the SLO allows.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Generic, Iterator, List, Optional, Sequence, TypeVar
+
+from prometheus_client import REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+
+from config import Settings, get_settings
+from observability.hdr_histogram import HdrHistogram
+
+STAGES = ("request", "search", "db", "llm")
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+SLOTS = 10
+
+T = TypeVar("T")
+
+
+class _Ring(Generic[T]):
+    """`slots` buckets that each cover `window_s / slots` seconds of wall clock."""
+
+    def __init__(self, window_s: float, factory: Callable[[], T], slots: int = SLOTS) -> None:
+        self._slot_s = window_s / slots
+        self._factory = factory
+        self._items: List[T] = [factory() for _ in range(slots)]
+        self._epochs: List[int] = [-1] * slots
+
+    def current(self, now: float) -> T:
+        """Bucket for `now`, recycling it if it still holds an expired slot."""
+        epoch = int(now // self._slot_s)
+        i = epoch % len(self._items)
+        if self._epochs[i] != epoch:
+            self._items[i] = self._factory()
+            self._epochs[i] = epoch
+        return self._items[i]
+
+    def live(self, now: float) -> Iterator[T]:
+        """Buckets that still fall inside the window ending at `now`."""
+        epoch = int(now // self._slot_s)
+        for item, item_epoch in zip(self._items, self._epochs):
+            if item_epoch >= 0 and epoch - item_epoch < len(self._items):
+                yield item
+
+
+class KpiAggregator:
+    """Thread-safe sliding-window aggregation of latency, outcome and cost signals."""
+
+    def __init__(
+        self,
+        window_s: float = 300.0,
+        slo_target: float = 0.99,
+        slo_latency_s: Optional[Dict[str, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.window_s = window_s
+        self.slo_target = slo_target
+        self.slo_latency_s = dict(slo_latency_s or {})
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Two significant digits (1% error) keep each slot to a few thousand counters.
+        self._latency = {stage: _Ring(window_s, lambda: HdrHistogram(significant_digits=2)) for stage in STAGES}
+        self._counters: _Ring[Counter] = _Ring(window_s, Counter)
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "KpiAggregator":
+        return cls(settings.kpi_window_s, settings.slo_target, dict(settings.slo_latency_s))
+
+    # -- recording -----------------------------------------------------------
+
+    def observe_stage(self, stage: str, seconds: float, ok: bool = True) -> None:
+        """Record one stage execution; failures count against the SLO regardless of speed."""
+        now = self._clock()
+        with self._lock:
+            histogram = self._latency[stage].current(now) if stage in self._latency else None
+            counts = self._counters.current(now)
+            counts[f"{stage}.total"] += 1
+            if not ok:
+                counts[f"{stage}.error"] += 1
+        if histogram is not None and ok:
+            histogram.record(seconds)
+
+    def observe_request(self, seconds: float, ok: bool) -> None:
+        self.observe_stage("request", seconds, ok)
+
+    def observe_llm(self, seconds: float, prompt_tokens: int, completion_tokens: int, cost_usd: float) -> None:
+        now = self._clock()
+        with self._lock:
+            histogram = self._latency["llm"].current(now)
+            counts = self._counters.current(now)
+            counts["llm.total"] += 1
+            counts["tokens"] += prompt_tokens + completion_tokens
+            counts["cost_usd"] += cost_usd
+        histogram.record(seconds)
+
+    # -- reading -------------------------------------------------------------
+
+    def latency(self, stage: str) -> HdrHistogram:
+        """Merged histogram of successful executions of `stage` within the window."""
+        merged = HdrHistogram(significant_digits=2)
+        now = self._clock()
+        with self._lock:
+            slots = list(self._latency[stage].live(now))
+        for slot in slots:
+            merged.merge(slot)
+        return merged
+
+    def totals(self) -> Counter:
+        now = self._clock()
+        totals: Counter = Counter()
+        with self._lock:
+            for counts in self._counters.live(now):
+                totals.update(counts)
+        return totals
+
+    def snapshot(self) -> Dict[str, object]:
+        """All windowed KPIs as plain numbers (used by the collector and for debugging)."""
+        totals = self.totals()
+        requests = totals["request.total"]
+        successes = requests - totals["request.error"]
+        llm_ok = totals["llm.total"] - totals["llm.error"]
+        latency = {}
+        burn = {}
+        for stage in STAGES:
+            histogram = self.latency(stage)
+            if histogram.count:  # No samples: export nothing rather than a fake 0s.
+                latency[stage] = dict(zip(QUANTILES, histogram.percentiles([q * 100 for q in QUANTILES])))
+            threshold = self.slo_latency_s.get(stage)
+            total = totals[f"{stage}.total"]
+            if threshold and total:  # Missing or 0 threshold: no SLO for this stage.
+                good = histogram.count_at_or_below(threshold)
+                burn[stage] = (1.0 - good / total) / (1.0 - self.slo_target)
+        return {
+            "window_s": self.window_s,
+            "requests": requests,
+            "successes": successes,
+            "success_ratio": successes / requests if requests else 1.0,
+            "llm_calls": llm_ok,
+            "cost_usd": totals["cost_usd"],
+            "cost_per_success_usd": totals["cost_usd"] / successes if successes else 0.0,
+            "cost_per_llm_call_usd": totals["cost_usd"] / llm_ok if llm_ok else 0.0,
+            "tokens_per_query": totals["tokens"] / requests if requests else 0.0,
+            "latency": latency,
+            "slo_burn_rate": burn,
+        }
+
+
+class KpiCollector:
+    """Custom Prometheus collector: computes the window snapshot at scrape time."""
+
+    def __init__(self, aggregator: KpiAggregator) -> None:
+        self._aggregator = aggregator
+
+    def describe(self) -> Sequence:
+        return []  # Skip the registration-time collect; series are produced at scrape.
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        snap = self._aggregator.snapshot()
+        window = f"{int(snap['window_s'])}s"
+
+        latency = GaugeMetricFamily(
+            "agentic_kpi_latency_seconds",
+            "Rolling latency quantiles per stage over the KPI window (HDR histogram)",
+            labels=["stage", "quantile", "window"],
+        )
+        for stage, quantiles in snap["latency"].items():
+            for q, value in quantiles.items():
+                latency.add_metric([stage, f"{q:g}", window], value)
+        yield latency
+
+        burn = GaugeMetricFamily(
+            "agentic_kpi_slo_burn_rate",
+            "Error-budget burn rate per stage (1.0 = burning exactly at the SLO)",
+            labels=["stage", "window"],
+        )
+        for stage, value in snap["slo_burn_rate"].items():
+            burn.add_metric([stage, window], value)
+        yield burn
+
+        scalars = (
+            ("agentic_kpi_requests", "Requests finished in the KPI window", "requests"),
+            ("agentic_kpi_success_ratio", "Share of requests that succeeded in the KPI window", "success_ratio"),
+            ("agentic_kpi_cost_usd", "LLM spend in USD over the KPI window", "cost_usd"),
+            ("agentic_kpi_cost_per_success_usd", "LLM USD per successful request (cache hits included)", "cost_per_success_usd"),
+            ("agentic_kpi_cost_per_llm_call_usd", "LLM USD per LLM call (cache misses only)", "cost_per_llm_call_usd"),
+            ("agentic_kpi_tokens_per_query", "Prompt + completion tokens per request", "tokens_per_query"),
+        )
+        for name, documentation, key in scalars:
+            family = GaugeMetricFamily(name, documentation, labels=["window"])
+            family.add_metric([window], float(snap[key]))
+            yield family
+
+
+_KPIS: Optional[KpiAggregator] = None
+_KPIS_LOCK = threading.Lock()
+
+
+def get_kpis() -> KpiAggregator:
+    """Process-wide aggregator, registered with the default Prometheus registry on first use."""
+    global _KPIS
+    if _KPIS is None:
+        with _KPIS_LOCK:
+            if _KPIS is None:
+                aggregator = KpiAggregator.from_settings(get_settings())
+                REGISTRY.register(KpiCollector(aggregator))
+                _KPIS = aggregator
+    return _KPIS
@@ -4,13 +4,13 @@ from __future__ import annotations
 
 import os
 
-from prometheus_client import Counter, Histogram, start_http_server
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
 
 # Basic KPIs
 REQUEST_COUNTER = Counter(
     "agentic_requests_total",
     "Total number of agentic research requests processed",
-    ["outcome"],  # "success" or "error"
+    ["outcome"],  # "success", "error" or "rejected" (tenant over quota)
 )
 
 REQUEST_LATENCY = Histogram(
@@ -40,6 +40,69 @@ TOTAL_COST_USD = Counter(
     "Total cost spent in USD for LLM usage",
 )
 
+# Per-provider routing signals for the LLM router
+LLM_PROVIDER_REQUESTS = Counter(
+    "agentic_llm_provider_requests_total",
+    "LLM calls attempted per provider",
+    ["provider", "outcome"],  # "success", "error" or "skipped" (breaker open)
+)
+
+LLM_PROVIDER_LATENCY_EWMA = Gauge(
+    "agentic_llm_provider_latency_ewma_seconds",
+    "Exponentially weighted moving average of LLM latency per provider",
+    ["provider"],
+)
+
+LLM_PROVIDER_ERROR_RATE = Gauge(
+    "agentic_llm_provider_error_rate",
+    "Exponentially weighted moving average of LLM error rate per provider",
+    ["provider"],
+)
+
+# Circuit breaker state per protected backend (0=closed, 1=half-open, 2=open)
+CIRCUIT_BREAKER_STATE = Gauge(
+    "agentic_circuit_breaker_state",
+    "Circuit breaker state per backend (0=closed, 1=half_open, 2=open)",
+    ["breaker"],
+)
+
+CIRCUIT_BREAKER_SHORT_CIRCUITS = Counter(
+    "agentic_circuit_breaker_short_circuits_total",
+    "Calls rejected immediately because the breaker was open",
+    ["breaker"],
+)
+
+CIRCUIT_BREAKER_TRIPS = Counter(
+    "agentic_circuit_breaker_trips_total",
+    "Number of times a breaker transitioned to open",
+    ["breaker"],
+)
+
+# Cache effectiveness per pipeline stage
+CACHE_REQUESTS = Counter(
+    "agentic_cache_requests_total",
+    "Cache lookups per stage cache",
+    ["cache", "result"],  # result: "hit", "stale" (served while refreshing) or "miss"
+)
+
+CACHE_REFRESHES = Counter(
+    "agentic_cache_refreshes_total",
+    "Background stale-while-revalidate refreshes per cache",
+    ["cache", "outcome"],  # "success", "uncacheable", "error" or "dropped"
+)
+
+CACHE_REFRESH_PENDING = Gauge(
+    "agentic_cache_refresh_pending",
+    "Refreshes queued or running in the background scheduler",
+)
+
+# Background warm-up of hot queries
+WARMUP_QUERIES = Counter(
+    "agentic_warmup_queries_total",
+    "Queries pre-executed by the warm-up subsystem",
+    ["outcome"],  # "success", "error" or "skipped_budget"
+)
+
 # Unanswerable query tracking
 UNANSWERABLE_QUERY_COUNTER = Counter(
     "agentic_unanswerable_queries_total",
@@ -52,6 +115,50 @@ QUERIES_PER_SESSION = Counter(
     "Total number of queries made in user session",
 )
 
+# Per-tenant attribution. `tenant` is bounded to the top-K heavy hitters plus
+# "other" (see services/tenancy.py), so these stay low-cardinality.
+TENANT_REQUESTS = Counter(
+    "agentic_tenant_requests_total",
+    "Requests per tenant",
+    ["tenant", "outcome"],  # "success", "error" or "rejected" (over quota)
+)
+
+TENANT_REQUEST_LATENCY = Histogram(
+    "agentic_tenant_request_latency_seconds",
+    "End-to-end request latency per tenant",
+    ["tenant"],
+)
+
+TENANT_LLM_TOKENS = Counter(
+    "agentic_tenant_llm_tokens_total",
+    "LLM tokens attributed to each tenant",
+    ["tenant", "kind"],  # "prompt" or "completion"
+)
+
+TENANT_LLM_COST_USD = Counter(
+    "agentic_tenant_llm_cost_usd_total",
+    "LLM spend in USD attributed to each tenant",
+    ["tenant"],
+)
+
+TENANT_QUOTA_REJECTIONS = Counter(
+    "agentic_tenant_quota_rejections_total",
+    "Requests or LLM calls rejected because the tenant exhausted its quota",
+    ["tenant"],
+)
+
+# Real per-session distribution: observed once a session goes idle.
+SESSION_QUERIES = Histogram(
+    "agentic_session_queries",
+    "Number of queries a session made before going idle",
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100),
+)
+
+ACTIVE_SESSIONS = Gauge(
+    "agentic_active_sessions",
+    "Sessions seen within the idle timeout",
+)
+
 # Revenue / productivity savings metric (manual input or compute later)
 REVENUE_SAVINGS = Counter(
     "agentic_revenue_savings_usd_total",
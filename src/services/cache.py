@@ -0,0 +1,218 @@
+"""In-process TTL caches shared by the research pipeline stages.
+
+Four named caches sit in front of the expensive work:
+
+* `RESULT_CACHE`  – complete `run_graph` results per query
+* `SEARCH_CACHE`  – merged retrieval results per query (network fan-out)
+* `SUMMARY_CACHE` – final LLM summaries per query (tokens = money)
+* `TRENDS_CACHE`  – Oracle trend rows per topic
+
+`get_or_load` is single-flight: concurrent misses for the same key wait for
+one loader and share its result (or exception) instead of stampeding the
+backend, even when the value is not cacheable (fallbacks, `CACHE_TTL_S=0`). TTL comes from `CACHE_TTL_S`
+(default 600s, `0` disables caching).
+
+Stale-while-revalidate: for `CACHE_STALE_S` after the TTL an entry is still
+returned immediately ("stale"). Its reload is handed to the background
+`services.refresh` scheduler, so an expiring hot key never makes a user wait or
+sends a burst of calls to OpenAI / Oracle. Keys read more often are refreshed
+first. If the refresh fails or yields an uncacheable value (e.g. a fallback),
+the stale value keeps being served until the stale window ends.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+from config import get_settings
+from observability.metrics import CACHE_REQUESTS
+from services.refresh import get_refresh_scheduler
+
+T = TypeVar("T")
+
+_MISSING = object()
+
+# True while a background refresh runs: nested cache reads must not answer
+# with stale data, or the refreshed entry would be rebuilt from stale parts.
+_REFRESHING: ContextVar[bool] = ContextVar("cache_refreshing", default=False)
+
+
+class _Entry:
+    __slots__ = ("fresh_until", "stale_until", "value", "hits")
+
+    def __init__(self, fresh_until: float, stale_until: float, value: Any, hits: int = 0) -> None:
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+        self.value = value
+        self.hits = hits
+
+
+class _Flight:
+    """One in-progress load; waiters read the leader's outcome once `done` is set."""
+
+    __slots__ = ("done", "value", "error", "cached")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        self.cached = False
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a TTL (plus a stale window)."""
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 1024,
+        ttl_s: Optional[float] = None,
+        stale_s: Optional[float] = None,
+    ) -> None:
+        self.name = name
+        self._max_entries = max_entries
+        self._ttl_s = ttl_s
+        self._stale_s = stale_s
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Hashable, _Flight] = {}
+
+    @property
+    def ttl_s(self) -> float:
+        return self._ttl_s if self._ttl_s is not None else get_settings().cache_ttl_s
+
+    @property
+    def stale_s(self) -> float:
+        return self._stale_s if self._stale_s is not None else get_settings().cache_stale_s
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._lookup(key)[0] is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Fresh value or `default`; stale entries need `get_or_load` to be refreshed."""
+        value, _ = self._lookup(key)
+        CACHE_REQUESTS.labels(cache=self.name, result="miss" if value is _MISSING else "hit").inc()
+        return default if value is _MISSING else value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        ttl = self.ttl_s
+        if ttl <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            previous = self._entries.get(key)
+            # Access counts survive refreshes so hot keys keep their priority.
+            hits = previous.hits if previous is not None else 0
+            self._entries[key] = _Entry(now + ttl, now + ttl + max(0.0, self.stale_s), value, hits)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], T],
+        should_cache: Callable[[T], bool] = lambda value: True,
+        refresher: Optional[Callable[[], T]] = None,
+    ) -> T:
+        """Return the cached value or run `loader` once per key across threads.
+
+        A stale entry is returned as-is and `refresher` (default: `loader`) is
+        scheduled in the background. Pass a separate refresher when `loader`
+        captures request-scoped state such as the caller's span.
+        """
+        value, hits = self._lookup(key, allow_stale=not _REFRESHING.get())
+        if value is not _MISSING:
+            if hits is None:
+                CACHE_REQUESTS.labels(cache=self.name, result="hit").inc()
+            else:
+                CACHE_REQUESTS.labels(cache=self.name, result="stale").inc()
+                self._schedule_refresh(key, refresher or loader, should_cache, hits)
+            return value
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            # Another thread is loading this key: share its outcome, cacheable or not.
+            flight.done.wait()
+            CACHE_REQUESTS.labels(cache=self.name, result="hit" if flight.cached else "miss").inc()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        CACHE_REQUESTS.labels(cache=self.name, result="miss").inc()
+        try:
+            flight.value = loader()
+            if should_cache(flight.value):
+                self.put(key, flight.value)
+                flight.cached = True
+            return flight.value
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def _schedule_refresh(
+        self,
+        key: Hashable,
+        refresher: Callable[[], T],
+        should_cache: Callable[[T], bool],
+        hits: int,
+    ) -> None:
+        def refresh() -> str:
+            token = _REFRESHING.set(True)
+            try:
+                value = refresher()
+            finally:
+                _REFRESHING.reset(token)
+            if not should_cache(value):
+                return "uncacheable"  # Keep serving the stale value.
+            self.put(key, value)
+            return "success"
+
+        get_refresh_scheduler().schedule((self.name, key), refresh, priority=hits)
+
+    def _lookup(self, key: Hashable, allow_stale: bool = False) -> "tuple[Any, Optional[int]]":
+        """Return `(value, None)` when fresh, `(value, hits)` when stale, else `(_MISSING, None)`."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING, None
+            if entry.stale_until < now:
+                del self._entries[key]
+                return _MISSING, None
+            if entry.fresh_until < now and not allow_stale:
+                return _MISSING, None
+            entry.hits += 1
+            self._entries.move_to_end(key)
+            return entry.value, (entry.hits if entry.fresh_until < now else None)
+
+
+def normalize_key(text: str) -> str:
+    """Cache key for free-text queries: case- and whitespace-insensitive."""
+    return " ".join(text.lower().split())
+
+
+RESULT_CACHE = TTLCache("result")
+SEARCH_CACHE = TTLCache("search")
+SUMMARY_CACHE = TTLCache("summary")
+TRENDS_CACHE = TTLCache("trends", max_entries=256)
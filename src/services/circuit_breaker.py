@@ -0,0 +1,125 @@
+"""Minimal thread-safe circuit breaker used to fail fast on degraded backends.
+
+The classic three-state machine:
+
+* ``closed``    – calls flow normally; consecutive failures are counted.
+* ``open``      – calls are rejected immediately until ``recovery_timeout_s``
+                  has elapsed, so a dead backend costs nothing per request.
+* ``half_open`` – a limited number of trial calls are let through; a success
+                  closes the breaker again, a failure re-opens it.
+
+Every transition is exported through `agentic_circuit_breaker_state{breaker=...}`
+so an outage is visible on the dashboard rather than only as slow requests.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, TypeVar
+
+from observability.metrics import (
+    CIRCUIT_BREAKER_SHORT_CIRCUITS,
+    CIRCUIT_BREAKER_STATE,
+    CIRCUIT_BREAKER_TRIPS,
+)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a call is rejected because the breaker is open."""
+
+
+class CircuitBreaker:
+    """Track failures for one backend and decide whether calls may proceed."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout_s: float = 30.0,
+        half_open_max_calls: int = 1,
+    ) -> None:
+        self.name = name
+        self._failure_threshold = max(1, failure_threshold)
+        self._recovery_timeout_s = recovery_timeout_s
+        self._half_open_max_calls = max(1, half_open_max_calls)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        CIRCUIT_BREAKER_STATE.labels(breaker=name).set(_STATE_VALUES[CLOSED])
+
+    @property
+    def state(self) -> str:
+        """Current state, promoting ``open`` to ``half_open`` once the timeout passes."""
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Return True if a call may proceed (reserving a half-open trial slot)."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._half_open_in_flight < self._half_open_max_calls:
+                self._half_open_in_flight += 1
+                return True
+        CIRCUIT_BREAKER_SHORT_CIRCUITS.labels(breaker=self.name).inc()
+        return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._half_open_in_flight = 0
+            if self._state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self._state == OPEN:
+                # Late failure from a call started before the trip: already counted
+                # as an outage, so don't extend the cooldown or count another trip.
+                return
+            if self._state == HALF_OPEN:
+                self._trip()
+                return
+            self._failures += 1
+            if self._failures >= self._failure_threshold:
+                self._trip()
+
+    def call(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Run ``fn`` under the breaker, raising CircuitOpenError when rejected."""
+        if not self.allow_request():
+            raise CircuitOpenError(f"circuit '{self.name}' is open")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def _set_state(self, state: str) -> None:
+        self._state = state
+        CIRCUIT_BREAKER_STATE.labels(breaker=self.name).set(_STATE_VALUES[state])
+
+    def _trip(self) -> None:
+        self._set_state(OPEN)
+        self._opened_at = time.monotonic()
+        self._half_open_in_flight = 0
+        CIRCUIT_BREAKER_TRIPS.labels(breaker=self.name).inc()
+
+    def _maybe_half_open(self) -> None:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self._recovery_timeout_s:
+            self._set_state(HALF_OPEN)
+            self._half_open_in_flight = 0
@@ -1,109 +1,223 @@
 """Oracle DB client supporting direct oracledb and optional SQLcl MCP path.
 
 Span name stays `oracle.query_trends` per SPEC.md. When the environment variable
-`USE_SQLCL_MCP=true` is set and a `sql` executable is found, the client will attempt
+`USE_SQLCL_MCP=true` is set and a `sql` executable is found (resolved once per
+settings snapshot, see `config.Settings.sqlcl_executable`), the client will attempt
 to run the query through SQLcl (as a lightweight stand‑in for a formal MCP server
 integration). Otherwise it falls back to the direct Python driver. This keeps the
 demo resilient while illustrating the optional path.
 
+Both paths sit behind circuit breakers (`oracle.sqlcl`, `oracle.direct`). While
+Oracle is down an open breaker skips the connect attempt entirely and the
+fallback rows are returned immediately; a half-open trial probes for recovery.
+
+The direct path borrows connections from a small `oracledb` pool instead of
+opening a new connection per query. On a settings reload the client swaps in
+a new pool (and connection settings) atomically and closes the old one.
+
 TODO (MCP full): Replace subprocess invocation with a proper MCP server session
 once SQLcl MCP endpoint contract is finalized (see SPEC.md).
 """
 
 from __future__ import annotations
 
-from typing import List, Dict, Any
-import os
-import shutil
+from typing import List, Optional
 import subprocess
+import threading
 import oracledb
-from config import get_settings
+from config import Settings, get_settings, on_settings_change
+from models import TrendResult, TrendRow
+from services.cache import TRENDS_CACHE, normalize_key
+from services.circuit_breaker import CircuitBreaker
 
 from opentelemetry import trace
 
+# Shared across client instances: an outage affects every caller equally.
+SQLCL_BREAKER = CircuitBreaker("oracle.sqlcl", failure_threshold=2, recovery_timeout_s=60.0)
+DIRECT_BREAKER = CircuitBreaker("oracle.direct", failure_threshold=2, recovery_timeout_s=30.0)
+
+QUERY = (
+    "SELECT year, trend FROM ai_database_trends "
+    "ORDER BY year DESC, trend FETCH FIRST 5 ROWS ONLY"
+)
+
+# NOTE:
+# These fallback rows are used when Oracle DB is unreachable or misconfigured,
+# so the demo still returns a "trends" shape.
+# They carry `fallback=True`, so the Streamlit UI can show a friendly message like:
+#   "We weren't able to find Oracle trend data about '<query>'"
+# instead of exposing them (text rendering still prefixes "(fallback)").
+FALLBACK_RESULT = TrendResult(
+    rows=(
+        TrendRow(2024, "AI-native databases", fallback=True),
+        TrendRow(2023, "vector databases", fallback=True),
+    ),
+    fallback=True,
+)
+
+
+POOL_MAX_CONNECTIONS = 4
+# Seconds a replaced pool waits for checked-out connections before a forced close.
+POOL_CLOSE_GRACE_S = 30.0
+
+
+class _Backend:
+    """Connection settings for one settings snapshot plus a lazily created pool."""
+
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self._pool: Optional[oracledb.ConnectionPool] = None
+        self._lock = threading.Lock()
+
+    def pool(self) -> oracledb.ConnectionPool:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = oracledb.create_pool(
+                        user=self.settings.oracle_user,
+                        password=self.settings.oracle_password,
+                        dsn=self.settings.oracle_dsn,
+                        min=1,
+                        max=POOL_MAX_CONNECTIONS,
+                        increment=1,
+                    )
+        return self._pool
+
+    def close(self) -> None:
+        """Close the pool; if connections are still checked out, force it after a grace period."""
+        pool = self._pool
+        if pool is None:
+            return
+        try:
+            pool.close()
+        except oracledb.Error:
+            # In-flight queries still hold connections; let them finish, then force.
+            timer = threading.Timer(POOL_CLOSE_GRACE_S, self._force_close, args=(pool,))
+            timer.daemon = True
+            timer.start()
+
+    @staticmethod
+    def _force_close(pool: "oracledb.ConnectionPool") -> None:
+        try:
+            pool.close(force=True)
+        except oracledb.Error:
+            pass  # Already closed.
+
+
 class OracleDBClient:
     """Simple wrapper around direct oracledb connectivity for demo queries."""
 
     def __init__(self) -> None:
-        settings = get_settings()
-        self._user = settings.oracle_user
-        self._password = settings.oracle_password
-        self._dsn = settings.oracle_dsn
+        self._backend = _Backend(get_settings())
+        on_settings_change(self._on_settings_change)
+
+    def _on_settings_change(self, old: Settings, new: Settings) -> None:
+        """Swap to a new backend when anything the DB path depends on changed."""
+        keys = ("oracle_user", "oracle_password", "oracle_dsn", "use_sqlcl_mcp", "sqlcl_executable")
+        if all(getattr(old, k) == getattr(new, k) for k in keys):
+            return
+        previous, self._backend = self._backend, _Backend(new)  # Atomic reference swap.
+        previous.close()
+        TRENDS_CACHE.clear()  # Rows may come from a different database now.
 
-    def query_trends(self, topic: str) -> List[Dict[str, Any]]:
+    def query_trends(self, topic: str) -> TrendResult:
         """Query recent AI database trends (top 5 rows) from Oracle.
 
         Decision order:
         1. If USE_SQLCL_MCP=true and `sql` present -> attempt SQLcl subprocess path.
         2. Else use direct oracledb driver.
         3. On any failure -> emit fallback rows + span error attribute.
+        An open circuit breaker skips its path without waiting for a timeout,
+        and real rows are served from `TRENDS_CACHE` (stale-while-revalidate).
         """
         tracer = trace.get_tracer(__name__)
         with tracer.start_as_current_span("oracle.query_trends") as span:
             span.set_attribute("db.topic", topic)
-            rows: List[Dict[str, Any]] = []
-            use_sqlcl = os.getenv("USE_SQLCL_MCP", "false").lower() == "true"
-            sql_exe = shutil.which("sql") if use_sqlcl else None
-            span.set_attribute("db.mcp.mode", "sqlcl" if (use_sqlcl and sql_exe) else "direct")
-
-            query = (
-                "SELECT year, trend FROM ai_database_trends "
-                "ORDER BY year DESC, trend FETCH FIRST 5 ROWS ONLY"
+            loaded = []
+
+            def load() -> TrendResult:
+                loaded.append(True)
+                return self._load_rows(span)
+
+            # Real rows are cached per topic; fallback rows are not, so recovery is seen.
+            # Results are immutable, so the cached object is shared without copying.
+            result = TRENDS_CACHE.get_or_load(
+                normalize_key(topic),
+                load,
+                should_cache=lambda r: not r.fallback,
+                refresher=lambda: self._load_rows(trace.get_current_span()),
             )
+            span.set_attribute("db.cache_hit", not loaded)
+            span.set_attribute("db.fallback", result.fallback)
+            span.set_attribute("db.rows_count", len(result.rows))
+            return result
+
+    def _load_rows(self, span) -> TrendResult:
+        """Run the SQLcl/direct decision chain and fall back to static rows."""
+        rows: List[TrendRow] = []
+        backend = self._backend  # One consistent snapshot for the whole query.
+        settings = backend.settings
+        span.set_attribute("db.mcp.mode", settings.db_mode)
 
-            if use_sqlcl and sql_exe:
-                # Attempt a lightweight SQLcl invocation. We request CSV output for easy parsing.
-                # NOTE: Flags may vary by SQLcl version; this is illustrative.
+        if settings.sqlcl_executable:
+            if SQLCL_BREAKER.allow_request():
                 try:
-                    cmd = [
-                        sql_exe,
-                        f"{self._user}/{self._password}@{self._dsn}",
-                        "-n",  # non-interactive
-                        "-S",  # silent banner
-                        "-L",  # attempt login retries
-                        f"SET SQLFORMAT CSV; {query};"
-                    ]
-                    proc = subprocess.run(cmd, capture_output=True, text=True, timeout=15)
-                    if proc.returncode != 0:
-                        raise RuntimeError(f"SQLcl exit {proc.returncode}: {proc.stderr.strip()}")
-                    # Parse CSV lines: expect header year,trend then rows.
-                    for line in proc.stdout.splitlines():
-                        line = line.strip()
-                        if not line or line.lower().startswith("year,"):
-                            continue
-                        parts = [p.strip() for p in line.split(",")]
-                        if len(parts) >= 2 and parts[0].isdigit():
-                            rows.append({"year": int(parts[0]), "trend": parts[1]})
+                    rows = self._query_sqlcl(settings)
+                    SQLCL_BREAKER.record_success()
                 except Exception as exc:
+                    SQLCL_BREAKER.record_failure()
                     span.set_attribute("db.error", f"sqlcl_failure: {exc}")
                     rows = []  # fallback to direct driver below if empty
+            else:
+                span.set_attribute("db.sqlcl.circuit", "open")
 
-            if not rows:
-                # Either not using SQLcl path or it failed; use direct driver.
+        if not rows:
+            # Either not using SQLcl path or it failed; use direct driver.
+            if DIRECT_BREAKER.allow_request():
                 try:
-                    conn = oracledb.connect(user=self._user, password=self._password, dsn=self._dsn)
-                    cur = conn.cursor()
-                    cur.execute(query)
-                    for year, trend in cur.fetchall():
-                        rows.append({"year": int(year), "trend": trend})
-                    cur.close()
-                    conn.close()
+                    rows = self._query_direct(backend)
+                    DIRECT_BREAKER.record_success()
                 except Exception as exc:
-                    # Final fallback rows.
-                    # NOTE:
-                    # These fallback rows are used when Oracle DB is unreachable or misconfigured,
-                    # so the demo still returns a "trends" shape.
-                    # The Streamlit UI now treats any row containing "(fallback)" as "no real data"
-                    # and shows a friendly message like:
-                    #   "We weren't able to find Oracle trend data about '<query>'"
-                    # instead of exposing these raw fallback strings to the user.
-                    if not rows:  # Only overwrite if still empty.
-                        rows = [
-                            {"year": 2024, "trend": "(fallback) AI-native databases"},
-                            {"year": 2023, "trend": "(fallback) vector databases"},
-                        ]
+                    DIRECT_BREAKER.record_failure()
                     span.set_attribute("db.error", f"direct_failure: {exc}")
+            else:
+                span.set_attribute("db.direct.circuit", "open")
+
+        if not rows:
+            # Final fallback rows.
+            return FALLBACK_RESULT
+
+        return TrendResult(rows=tuple(rows))
 
-            span.set_attribute("db.rows_count", len(rows))
-            return rows
+    def _query_sqlcl(self, settings: Settings) -> List[TrendRow]:
+        """Run the query through a SQLcl subprocess and parse its CSV output."""
+        # We request CSV output for easy parsing.
+        # NOTE: Flags may vary by SQLcl version; this is illustrative.
+        cmd = [
+            settings.sqlcl_executable,
+            f"{settings.oracle_user}/{settings.oracle_password}@{settings.oracle_dsn}",
+            "-n",  # non-interactive
+            "-S",  # silent banner
+            "-L",  # attempt login retries
+            f"SET SQLFORMAT CSV; {QUERY};"
+        ]
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=15)
+        if proc.returncode != 0:
+            raise RuntimeError(f"SQLcl exit {proc.returncode}: {proc.stderr.strip()}")
+        # Parse CSV lines: expect header year,trend then rows.
+        rows: List[TrendRow] = []
+        for line in proc.stdout.splitlines():
+            line = line.strip()
+            if not line or line.lower().startswith("year,"):
+                continue
+            parts = [p.strip() for p in line.split(",")]
+            if len(parts) >= 2 and parts[0].isdigit():
+                rows.append(TrendRow(int(parts[0]), parts[1]))
+        return rows
 
+    def _query_direct(self, backend: _Backend) -> List[TrendRow]:
+        """Run the query with the python-oracledb driver on a pooled connection."""
+        with backend.pool().acquire() as conn:
+            with conn.cursor() as cur:
+                cur.execute(QUERY)
+                return [TrendRow(int(year), trend) for year, trend in cur.fetchall()]
@@ -0,0 +1,476 @@
+"""Local full-text index over internal research documents (BM25, no network).
+
+Text/markdown files are split into paragraph-sized chunks, and each chunk is
+indexed as one document. The on-disk layout under `DOC_INDEX_DIR` (default
+`data/index`) is a small log-structured design:
+
+    manifest.json        live segments, per-file mtime/size/doc ids, tombstones
+    seg-000001.lex.json  term -> [offset, count] into the postings file
+    seg-000001.post      packed little-endian (doc_id: uint32, tf: uint32) pairs
+    seg-000001.docs.json doc_id -> [path, title, length, text]
+
+Ingestion is incremental: only new or modified files are tokenized, and they
+are written as a new immutable segment. Replaced or deleted files are recorded
+as tombstones. The manifest is swapped with an atomic `os.replace`, so readers
+never see a half-written index. When too many segments pile up they are
+compacted into one.
+
+Readers open postings files with `mmap` and decode them straight from the
+mapped pages (`struct.iter_unpack` over a memoryview). A `DocumentIndex` holds
+an immutable snapshot, so any number of threads can search concurrently
+without locks. The snapshot is refreshed when the manifest changes on disk.
+
+CLI:
+    PYTHONPATH=src python -m services.doc_index ingest data/docs
+    PYTHONPATH=src python -m services.doc_index search "vector databases"
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from models import SearchSummary, SourceRef
+
+MANIFEST = "manifest.json"
+SUFFIXES = (".txt", ".md", ".markdown")
+POSTING = struct.Struct("<II")  # (doc_id, term frequency)
+CHUNK_WORDS = 120
+MAX_SEGMENTS = 8
+# Replaced segments stay mapped this long so in-flight searches can finish.
+SEGMENT_CLOSE_GRACE_S = 10.0
+# BM25 parameters (the usual defaults).
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_WS_RE = re.compile(r"\s+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the to was were will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens without stopwords."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def chunk_text(text: str, max_words: int = CHUNK_WORDS) -> List[str]:
+    """Group paragraphs into chunks of roughly `max_words` words."""
+    chunks: List[str] = []
+    current: List[str] = []
+    words = 0
+    for paragraph in text.split("\n\n"):
+        paragraph = _WS_RE.sub(" ", paragraph).strip()
+        if not paragraph:
+            continue
+        n = len(paragraph.split())
+        if current and words + n > max_words:
+            chunks.append(" ".join(current))
+            current, words = [], 0
+        current.append(paragraph)
+        words += n
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    doc_id: int
+    score: float
+    path: str
+    title: str
+    text: str
+
+    @property
+    def uri(self) -> str:
+        # Indexes built before paths were stored resolved may hold relative ones.
+        return Path(self.path).resolve().as_uri()
+
+
+@dataclass(frozen=True)
+class IngestStats:
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    chunks: int = 0
+
+
+class _Segment:
+    """One immutable segment: lexicon and doc table in memory, postings mmap'd."""
+
+    def __init__(self, directory: Path, name: str) -> None:
+        self.name = name
+        with open(directory / f"{name}.lex.json", encoding="utf-8") as fh:
+            self.lexicon: Dict[str, List[int]] = json.load(fh)
+        with open(directory / f"{name}.docs.json", encoding="utf-8") as fh:
+            self.docs: Dict[int, list] = {int(k): v for k, v in json.load(fh).items()}
+
+        self._file = open(directory / f"{name}.post", "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map: Optional[mmap.mmap] = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        )
+
+    def postings(self, term: str) -> Iterable[Tuple[int, int]]:
+        entry = self.lexicon.get(term)
+        if entry is None or self._map is None:
+            return ()
+        offset, count = entry
+        start = offset * POSTING.size
+        # Decode straight from the mapped pages; no intermediate bytes copy.
+        return POSTING.iter_unpack(memoryview(self._map)[start : start + count * POSTING.size])
+
+    def close(self) -> None:
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                return  # Still being read; dropped with the last reference instead.
+        self._file.close()
+
+
+def _close_later(segments: Sequence[_Segment]) -> None:
+    """Close replaced segments once searches on older snapshots are done with them."""
+    if not segments:
+        return
+
+    def close() -> None:
+        for segment in segments:
+            segment.close()
+
+    timer = threading.Timer(SEGMENT_CLOSE_GRACE_S, close)
+    timer.daemon = True
+    timer.start()
+
+
+class _Snapshot:
+    """Immutable view of the index at one manifest generation."""
+
+    def __init__(self, segments: Sequence[_Segment], deleted: Set[int]) -> None:
+        self.segments = list(segments)
+        self.deleted = deleted
+        self.doc_count = 0
+        total_length = 0
+        for segment in self.segments:
+            for doc_id, meta in segment.docs.items():
+                if doc_id not in deleted:
+                    self.doc_count += 1
+                    total_length += meta[2]
+        self.avg_length = (total_length / self.doc_count) if self.doc_count else 0.0
+
+    def doc(self, doc_id: int) -> Optional[list]:
+        for segment in self.segments:
+            meta = segment.docs.get(doc_id)
+            if meta is not None:
+                return meta
+        return None
+
+
+def _read_manifest(directory: Path) -> dict:
+    try:
+        with open(directory / MANIFEST, encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {"version": 1, "next_doc_id": 1, "next_segment": 1, "segments": [], "files": {}, "deleted": []}
+
+
+def _write_json_atomic(path: Path, payload: object) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(payload, fh, separators=(",", ":"))
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+class DocumentIndex:
+    """Concurrent BM25 searcher over an on-disk index directory."""
+
+    REFRESH_INTERVAL_S = 1.0
+
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory)
+        self._lock = threading.Lock()  # Guards refresh and writes; searches are lock-free.
+        self._segments: Dict[str, _Segment] = {}
+        self._manifest_mtime = -1
+        self._checked_at = 0.0
+        self._snapshot = _Snapshot([], set())
+        self.refresh(force=True)
+
+    # ------------------------------------------------------------------ reads
+    def refresh(self, force: bool = False) -> None:
+        """Reload the snapshot if the manifest changed since the last check."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.REFRESH_INTERVAL_S:
+            return
+        # Searches never queue behind a writer: if one holds the lock, skip this check.
+        if not self._lock.acquire(blocking=force):
+            return
+        try:
+            self._checked_at = now
+            try:
+                mtime = (self.directory / MANIFEST).stat().st_mtime_ns
+            except FileNotFoundError:
+                return
+            if mtime == self._manifest_mtime:
+                return
+            manifest = _read_manifest(self.directory)
+            # Segments are immutable, so previously opened ones are reused as-is.
+            segments = [self._segments.get(name) or _Segment(self.directory, name) for name in manifest["segments"]]
+            retired = [s for name, s in self._segments.items() if name not in manifest["segments"]]
+            self._segments = {s.name: s for s in segments}
+            self._snapshot = _Snapshot(segments, set(manifest["deleted"]))
+            self._manifest_mtime = mtime
+            _close_later(retired)
+        finally:
+            self._lock.release()
+
+    def __len__(self) -> int:
+        return self._snapshot.doc_count
+
+    def search(self, query: str, k: int = 5) -> List[SearchHit]:
+        """Return the top-k chunks for `query` ranked by BM25."""
+        self.refresh()
+        snap = self._snapshot  # Local reference: a concurrent refresh can't affect us.
+        if not snap.doc_count:
+            return []
+
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = [
+                (doc_id, tf)
+                for segment in snap.segments
+                for doc_id, tf in segment.postings(term)
+                if doc_id not in snap.deleted
+            ]
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1.0 + (snap.doc_count - df + 0.5) / (df + 0.5))
+            for doc_id, tf in postings:
+                length = snap.doc(doc_id)[2]
+                norm = tf + BM25_K1 * (1.0 - BM25_B + BM25_B * length / snap.avg_length)
+                scores[doc_id] += idf * tf * (BM25_K1 + 1.0) / norm
+
+        hits = []
+        for doc_id, score in heapq.nlargest(k, scores.items(), key=lambda item: item[1]):
+            path, title, _, text = snap.doc(doc_id)
+            hits.append(SearchHit(doc_id, score, path, title, text))
+        return hits
+
+    # ----------------------------------------------------------------- writes
+    def ingest(self, roots: Sequence[str]) -> IngestStats:
+        """Index new/modified files under `roots`; tombstone changed or deleted ones.
+
+        Single writer per index directory; concurrent readers are fine.
+        """
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            manifest = _read_manifest(self.directory)
+            files: Dict[str, dict] = manifest["files"]
+            deleted: Set[int] = set(manifest["deleted"])
+
+            seen: Set[str] = set()
+            changed: List[Tuple[Path, os.stat_result]] = []
+            added = updated = unchanged = 0
+            for root in roots:
+                root_path = Path(root)
+                candidates = [root_path] if root_path.is_file() else sorted(root_path.rglob("*"))
+                for path in candidates:
+                    if not path.is_file() or path.suffix.lower() not in SUFFIXES:
+                        continue
+                    key = str(path.resolve())
+                    seen.add(key)
+                    st = path.stat()
+                    entry = files.get(key)
+                    if entry and entry["mtime"] == st.st_mtime and entry["size"] == st.st_size:
+                        unchanged += 1
+                        continue
+                    if entry:
+                        deleted.update(entry["doc_ids"])
+                        updated += 1
+                    else:
+                        added += 1
+                    changed.append((path, st))
+
+            # Files previously indexed under these roots that have disappeared.
+            removed = 0
+            resolved_roots = [str(Path(r).resolve()) for r in roots]
+            for key in list(files):
+                if key not in seen and any(key == r or key.startswith(r + os.sep) for r in resolved_roots):
+                    deleted.update(files.pop(key)["doc_ids"])
+                    removed += 1
+
+            chunks = 0
+            if changed:
+                docs: Dict[int, list] = {}
+                postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+                next_id = manifest["next_doc_id"]
+                for path, st in changed:
+                    key = str(path.resolve())
+                    text = path.read_text(encoding="utf-8", errors="replace")
+                    doc_ids = []
+                    for chunk in chunk_text(text):
+                        tokens = tokenize(chunk)
+                        if not tokens:
+                            continue
+                        doc_id, next_id = next_id, next_id + 1
+                        docs[doc_id] = [key, path.stem, len(tokens), chunk]
+                        for term, tf in Counter(tokens).items():
+                            postings[term].append((doc_id, tf))
+                        doc_ids.append(doc_id)
+                    files[key] = {"mtime": st.st_mtime, "size": st.st_size, "doc_ids": doc_ids}
+                    chunks += len(doc_ids)
+                manifest["next_doc_id"] = next_id
+                if docs:
+                    manifest["segments"].append(self._write_segment(manifest, docs, postings))
+
+            if changed or removed:
+                manifest["files"] = files
+                manifest["deleted"] = sorted(deleted)
+                if len(manifest["segments"]) > MAX_SEGMENTS:
+                    self._compact_locked(manifest)
+                else:
+                    _write_json_atomic(self.directory / MANIFEST, manifest)
+
+        self.refresh(force=True)
+        return IngestStats(added, updated, removed, unchanged, chunks)
+
+    def compact(self) -> None:
+        """Merge all segments into one and drop tombstoned documents."""
+        with self._lock:
+            manifest = _read_manifest(self.directory)
+            if manifest["segments"]:
+                self._compact_locked(manifest)
+        self.refresh(force=True)
+
+    def _compact_locked(self, manifest: dict) -> None:
+        deleted = set(manifest["deleted"])
+        old = [self._segments.get(name) or _Segment(self.directory, name) for name in manifest["segments"]]
+        docs: Dict[int, list] = {}
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for segment in old:
+            docs.update((d, m) for d, m in segment.docs.items() if d not in deleted)
+            # Re-use the stored postings instead of re-tokenizing the text.
+            for term in segment.lexicon:
+                postings[term].extend(p for p in segment.postings(term) if p[0] not in deleted)
+
+        manifest["segments"] = [self._write_segment(manifest, docs, postings)] if docs else []
+        manifest["deleted"] = []
+        _write_json_atomic(self.directory / MANIFEST, manifest)
+
+        # Segments opened only for this merge have no readers; the rest are closed
+        # by the next refresh, after a grace period. Unlinking mapped files is safe on POSIX.
+        for segment in old:
+            if segment.name not in self._segments:
+                segment.close()
+            for suffix in (".lex.json", ".docs.json", ".post"):
+                try:
+                    os.remove(self.directory / f"{segment.name}{suffix}")
+                except OSError:
+                    pass
+
+    def _write_segment(self, manifest: dict, docs: Dict[int, list], postings: Dict[str, List[Tuple[int, int]]]) -> str:
+        name = f"seg-{manifest['next_segment']:06d}"
+        manifest["next_segment"] += 1
+
+        lexicon: Dict[str, List[int]] = {}
+        offset = 0
+        with open(self.directory / f"{name}.post", "wb") as fh:
+            for term in sorted(postings):
+                plist = postings[term]
+                if not plist:
+                    continue
+                fh.write(b"".join(POSTING.pack(doc_id, tf) for doc_id, tf in plist))
+                lexicon[term] = [offset, len(plist)]
+                offset += len(plist)
+            fh.flush()
+            os.fsync(fh.fileno())
+
+        _write_json_atomic(self.directory / f"{name}.lex.json", lexicon)
+        _write_json_atomic(self.directory / f"{name}.docs.json", {str(k): v for k, v in docs.items()})
+        return name
+
+
+_INDEX: Optional[DocumentIndex] = None
+_INDEX_LOCK = threading.Lock()
+_INDEX_LISTENING = False
+
+
+def get_document_index() -> DocumentIndex:
+    """Return the process-wide index for `DOC_INDEX_DIR`."""
+    global _INDEX, _INDEX_LISTENING
+    if _INDEX is None:
+        with _INDEX_LOCK:
+            if _INDEX is None:
+                from config import get_settings, on_settings_change
+
+                _INDEX = DocumentIndex(get_settings().doc_index_dir)
+                if not _INDEX_LISTENING:
+                    on_settings_change(_on_settings_change)
+                    _INDEX_LISTENING = True
+    return _INDEX
+
+
+def _on_settings_change(old, new) -> None:
+    global _INDEX
+    if old.doc_index_dir != new.doc_index_dir:
+        with _INDEX_LOCK:
+            _INDEX = None  # Reopened from the new directory on next use.
+
+
+def local_index_research(query: str) -> SearchSummary:
+    """`SearchAgent`-compatible search_fn: top local passages, no network or LLM."""
+    hits = get_document_index().search(query, k=3)
+    if not hits:
+        return SearchSummary(text="No matching internal documents found.", provider="local", unanswerable=True)
+    return SearchSummary(
+        text="\n".join(f"- [{hit.title}] {hit.text}" for hit in hits),
+        sources=tuple(SourceRef("local", hit.uri, hit.title) for hit in hits),
+        provider="local",
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local research document index")
+    parser.add_argument("--index-dir", default=None, help="Defaults to DOC_INDEX_DIR (settings / .env)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest_p = sub.add_parser("ingest", help="Incrementally index files or folders")
+    ingest_p.add_argument("paths", nargs="+")
+    search_p = sub.add_parser("search", help="Run a BM25 query")
+    search_p.add_argument("query")
+    search_p.add_argument("-k", type=int, default=5)
+    sub.add_parser("compact", help="Merge segments and drop tombstones")
+    args = parser.parse_args(argv)
+
+    from config import get_settings
+
+    index = DocumentIndex(args.index_dir or get_settings().doc_index_dir)
+    if args.command == "ingest":
+        print(index.ingest(args.paths))
+    elif args.command == "search":
+        for hit in index.search(args.query, k=args.k):
+            print(f"{hit.score:7.3f}  {hit.title}: {hit.text[:100]}")
+    else:
+        index.compact()
+        print(f"compacted: {len(index)} live chunks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""Provider abstraction and latency/cost-aware router for LLM calls.
+
+`LLM_PROVIDER` picks the primary backend and `LLM_FALLBACK_PROVIDERS` registers
+extra ones (e.g. `ollama:llama3.1,stub`). For every request the router ranks the
+healthy providers by a score built from live signals:
+
+    score = EWMA latency + ERROR_PENALTY_S * EWMA error rate + COST_WEIGHT * EWMA cost
+
+Fallback providers carry an extra `FALLBACK_HANDICAP_S`, so the primary keeps
+serving traffic unless it is clearly slower or failing; a cheaper fallback alone
+does not take over. The EWMAs decay back to their starting values with a
+half-life of `STATS_HALF_LIFE_S` between observations, so a provider that had a
+transient error (and is therefore no longer tried) regains its ranking and gets
+probed again instead of being penalized forever.
+
+Each provider sits behind a circuit breaker, so a degraded backend is skipped
+immediately and the next-best one is used instead. The local stub is marked
+`fallback_only` and is only consulted when every real provider is unavailable.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+from openai import OpenAI
+
+from config import Settings, get_settings, on_settings_change
+from observability.metrics import (
+    LLM_PROVIDER_ERROR_RATE,
+    LLM_PROVIDER_LATENCY_EWMA,
+    LLM_PROVIDER_REQUESTS,
+    LLM_REQUEST_LATENCY,
+    TOTAL_COMPLETION_TOKENS,
+    TOTAL_COST_USD,
+    TOTAL_PROMPT_TOKENS,
+)
+from observability.kpi import get_kpis
+from services.circuit_breaker import CircuitBreaker
+from services.tenancy import current_context, get_accounting
+
+# Model pricing per 1K tokens (USD). Unknown models are priced like gpt-4o-mini.
+MODEL_PRICING = {
+    "gpt-4o-mini": {"prompt": 0.00015, "completion": 0.0006},
+    "gpt-4o": {"prompt": 0.0025, "completion": 0.01},
+    "gpt-4.1": {"prompt": 0.002, "completion": 0.008},
+    "gpt-4.1-mini": {"prompt": 0.0004, "completion": 0.0016},
+    "gpt-4.1-nano": {"prompt": 0.0001, "completion": 0.0004},
+    # Self-hosted backends cost nothing per token.
+    "llama3.1": {"prompt": 0.0, "completion": 0.0},
+    "local-stub": {"prompt": 0.0, "completion": 0.0},
+}
+
+# Well-known OpenAI-compatible endpoints, used when no LLM_BASE_URL is given.
+DEFAULT_BASE_URLS = {
+    "ollama": "http://localhost:11434/v1",
+}
+
+# Routing weights: one unit of error rate costs 5s, one USD per call costs 1000s.
+EWMA_ALPHA = 0.3
+ERROR_PENALTY_S = 5.0
+COST_WEIGHT_S_PER_USD = 1000.0
+# Fallbacks must beat the primary by this much before they are preferred.
+FALLBACK_HANDICAP_S = 2.0
+# Idle stats drift halfway back to their prior every STATS_HALF_LIFE_S.
+STATS_HALF_LIFE_S = 120.0
+# Token volume assumed for a call before any real usage has been observed.
+EXPECTED_PROMPT_TOKENS = 1000
+EXPECTED_COMPLETION_TOKENS = 200
+
+
+def estimate_llm_cost_usd(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimate LLM cost in USD based on token usage and model pricing."""
+    pricing = MODEL_PRICING.get(model, MODEL_PRICING["gpt-4o-mini"])
+    return ((prompt_tokens / 1000.0) * pricing["prompt"]) + ((completion_tokens / 1000.0) * pricing["completion"])
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when no registered provider could serve a request."""
+
+
+@dataclass(frozen=True)
+class LLMResult:
+    """Normalized completion returned by every provider."""
+
+    text: str
+    provider: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def cost_usd(self) -> float:
+        return estimate_llm_cost_usd(self.model, self.prompt_tokens, self.completion_tokens)
+
+
+class LLMProvider(ABC):
+    """Base class for chat-completion backends."""
+
+    name: str = "base"
+    model: str = ""
+    fallback_only: bool = False
+
+    @abstractmethod
+    def complete(self, messages: Sequence[Dict[str, str]], temperature: float, max_tokens: int) -> LLMResult:
+        """Run one completion; may raise, the router then fails over."""
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """Any endpoint speaking the OpenAI Chat Completions API (OpenAI, Ollama, vLLM...)."""
+
+    def __init__(self, name: str, model: str, api_key: str = "", base_url: str = "", timeout_s: float = 30.0) -> None:
+        self.name = name
+        self.model = model
+        self._api_key = api_key
+        self._base_url = base_url
+        self._timeout_s = timeout_s
+        self._client: Optional[OpenAI] = None
+
+    def _get_client(self) -> OpenAI:
+        # The client holds a connection pool, so build it once instead of per call.
+        # Built lazily so a missing API key surfaces as a (fail-over-able) call error.
+        if self._client is None:
+            self._client = OpenAI(
+                api_key=self._api_key or None,
+                base_url=self._base_url or None,
+                timeout=self._timeout_s,
+            )
+        return self._client
+
+    def complete(self, messages: Sequence[Dict[str, str]], temperature: float, max_tokens: int) -> LLMResult:
+        response = self._get_client().chat.completions.create(
+            model=self.model,
+            messages=list(messages),
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        text = (response.choices[0].message.content or "").strip()
+
+        prompt_tokens = completion_tokens = 0
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            prompt_tokens = getattr(usage, "input_tokens", 0) or getattr(usage, "prompt_tokens", 0) or 0
+            completion_tokens = getattr(usage, "output_tokens", 0) or getattr(usage, "completion_tokens", 0) or 0
+
+        return LLMResult(text, self.name, self.model, prompt_tokens, completion_tokens)
+
+
+class LocalStubProvider(LLMProvider):
+    """Zero-network extractive "summary": echoes the first lines of the search context.
+
+    Useful as a last-resort fallback and for load tests that must not spend money.
+    """
+
+    def __init__(self, name: str = "stub", model: str = "local-stub", fallback_only: bool = True) -> None:
+        self.name = name
+        self.model = model
+        self.fallback_only = fallback_only
+
+    def complete(self, messages: Sequence[Dict[str, str]], temperature: float, max_tokens: int) -> LLMResult:
+        prompt = messages[-1]["content"] if messages else ""
+        # Prompts built by web_search put the context between these two markers.
+        context = prompt.split("Search Results:", 1)[-1].split("Provide your summary", 1)[0]
+        lines = [line.strip("- ").strip() for line in context.splitlines() if line.strip()]
+        text = " ".join(lines[:3]) or "No summary available."
+        return LLMResult(text, self.name, self.model)
+
+
+class _ProviderStats:
+    """EWMA latency, error rate and cost for one provider (guarded by the router lock)."""
+
+    __slots__ = ("latency_s", "error_rate", "cost_usd", "prior_cost_usd", "updated_at")
+
+    def __init__(self, model: str, now: float) -> None:
+        self.latency_s = 0.0  # Optimistic until the first observation.
+        self.error_rate = 0.0
+        self.prior_cost_usd = estimate_llm_cost_usd(model, EXPECTED_PROMPT_TOKENS, EXPECTED_COMPLETION_TOKENS)
+        self.cost_usd = self.prior_cost_usd
+        self.updated_at = now
+
+    def decay(self, now: float) -> None:
+        """Pull the averages back toward the prior for the time since the last update."""
+        keep = 0.5 ** (max(0.0, now - self.updated_at) / STATS_HALF_LIFE_S)
+        self.latency_s *= keep
+        self.error_rate *= keep
+        self.cost_usd = self.prior_cost_usd + keep * (self.cost_usd - self.prior_cost_usd)
+        self.updated_at = now
+
+    def observe(self, now: float, latency_s: float, ok: bool, cost_usd: Optional[float] = None) -> None:
+        self.decay(now)
+        self.latency_s += EWMA_ALPHA * (latency_s - self.latency_s)
+        self.error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        if cost_usd is not None:
+            self.cost_usd += EWMA_ALPHA * (cost_usd - self.cost_usd)
+
+    def score(self, now: float) -> float:
+        self.decay(now)
+        return self.latency_s + ERROR_PENALTY_S * self.error_rate + COST_WEIGHT_S_PER_USD * self.cost_usd
+
+
+class LLMRouter:
+    """Pick the best healthy provider per request and fail over on errors."""
+
+    def __init__(self, providers: Sequence[LLMProvider] = (), clock: Callable[[], float] = time.monotonic) -> None:
+        self._lock = threading.Lock()
+        self._clock = clock
+        self._providers: List[LLMProvider] = []
+        self._stats: Dict[str, _ProviderStats] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        for provider in providers:
+            self.register(provider)
+
+    def register(self, provider: LLMProvider) -> None:
+        with self._lock:
+            self._providers.append(provider)
+            self._stats[provider.name] = _ProviderStats(provider.model, self._clock())
+            self._breakers[provider.name] = CircuitBreaker(
+                f"llm.{provider.name}", failure_threshold=3, recovery_timeout_s=30.0
+            )
+
+    @property
+    def providers(self) -> List[LLMProvider]:
+        return list(self._providers)
+
+    def ranked(self) -> List[LLMProvider]:
+        """Providers in the order they should be tried: best score first, stubs last.
+
+        The first registered provider is the primary; the others are handicapped.
+        """
+        now = self._clock()
+        with self._lock:
+            order = {p.name: i for i, p in enumerate(self._providers)}
+            scores = {
+                p.name: self._stats[p.name].score(now) + (FALLBACK_HANDICAP_S if order[p.name] else 0.0)
+                for p in self._providers
+            }
+            return sorted(self._providers, key=lambda p: (p.fallback_only, scores[p.name], order[p.name]))
+
+    def complete(
+        self,
+        messages: Sequence[Dict[str, str]],
+        temperature: float = 0.2,
+        max_tokens: int = 400,
+    ) -> LLMResult:
+        """Run a chat completion on the best available provider.
+
+        Raises `QuotaExceededError` up front if the current tenant is over budget.
+        """
+        tenant = current_context().tenant
+        accounting = get_accounting()
+        accounting.check_quota(tenant)
+        last_error: Optional[BaseException] = None
+
+        for provider in self.ranked():
+            breaker = self._breakers[provider.name]
+            if not breaker.allow_request():
+                LLM_PROVIDER_REQUESTS.labels(provider=provider.name, outcome="skipped").inc()
+                continue
+
+            start = time.perf_counter()
+            try:
+                result = provider.complete(messages, temperature, max_tokens)
+            except Exception as exc:
+                elapsed = time.perf_counter() - start
+                breaker.record_failure()
+                self._observe(provider, elapsed, ok=False)
+                get_kpis().observe_stage("llm", elapsed, ok=False)
+                last_error = exc
+                continue
+
+            elapsed = time.perf_counter() - start
+            breaker.record_success()
+            self._observe(provider, elapsed, ok=True, cost_usd=result.cost_usd)
+
+            TOTAL_PROMPT_TOKENS.inc(result.prompt_tokens)
+            TOTAL_COMPLETION_TOKENS.inc(result.completion_tokens)
+            TOTAL_COST_USD.inc(result.cost_usd)
+            get_kpis().observe_llm(elapsed, result.prompt_tokens, result.completion_tokens, result.cost_usd)
+            accounting.record_llm(tenant, result.prompt_tokens, result.completion_tokens, result.cost_usd)
+            return result
+
+        if last_error is not None:
+            raise last_error
+        raise LLMUnavailableError("no LLM provider available (all circuits open)")
+
+    def _observe(self, provider: LLMProvider, elapsed: float, ok: bool, cost_usd: Optional[float] = None) -> None:
+        LLM_REQUEST_LATENCY.observe(elapsed)
+        LLM_PROVIDER_REQUESTS.labels(provider=provider.name, outcome="success" if ok else "error").inc()
+        with self._lock:
+            stats = self._stats[provider.name]
+            stats.observe(self._clock(), elapsed, ok, cost_usd)
+            latency, error_rate = stats.latency_s, stats.error_rate
+        LLM_PROVIDER_LATENCY_EWMA.labels(provider=provider.name).set(latency)
+        LLM_PROVIDER_ERROR_RATE.labels(provider=provider.name).set(error_rate)
+
+
+def build_provider(spec: str, settings: Settings, fallback: bool = False) -> LLMProvider:
+    """Create a provider from a `name` or `name:model` spec."""
+    name, _, model = spec.partition(":")
+    name = name.strip().lower()
+    if name in ("stub", "local"):
+        return LocalStubProvider(name=name, fallback_only=True)
+
+    model = model or settings.llm_model
+    if not fallback:
+        base_url = settings.llm_base_url or DEFAULT_BASE_URLS.get(name, "")
+    elif name == "openai":
+        base_url = ""  # LLM_BASE_URL belongs to the primary; OpenAI uses its own default.
+    else:
+        base_url = DEFAULT_BASE_URLS.get(name, settings.llm_base_url)
+    # Ollama ignores the key but the OpenAI client insists on one.
+    api_key = settings.llm_api_key if name not in DEFAULT_BASE_URLS else "ollama"
+    return OpenAICompatibleProvider(name=name, model=model, api_key=api_key, base_url=base_url)
+
+
+def build_router(settings: Settings) -> LLMRouter:
+    """Register the primary provider plus any configured fallbacks."""
+    router = LLMRouter([build_provider(settings.llm_provider, settings)])
+    seen = {settings.llm_provider.partition(":")[0].lower()}
+    for spec in settings.llm_fallback_providers:
+        name = spec.partition(":")[0].strip().lower()
+        if name in seen:
+            continue
+        seen.add(name)
+        router.register(build_provider(spec, settings, fallback=True))
+    return router
+
+
+_ROUTER: Optional[LLMRouter] = None
+_ROUTER_LOCK = threading.Lock()
+
+
+def get_llm_router() -> LLMRouter:
+    """Return the process-wide router, building it from settings on first use."""
+    global _ROUTER
+    if _ROUTER is None:
+        with _ROUTER_LOCK:
+            if _ROUTER is None:
+                _ROUTER = build_router(get_settings())
+    return _ROUTER
+
+
+def set_llm_router(router: Optional[LLMRouter]) -> None:
+    """Swap the process-wide router (tests, load tools, config reloads)."""
+    global _ROUTER
+    with _ROUTER_LOCK:
+        _ROUTER = router
+
+
+_ROUTER_SETTINGS = ("llm_provider", "llm_model", "llm_api_key", "llm_base_url", "llm_fallback_providers")
+
+
+def _on_settings_change(old: Settings, new: Settings) -> None:
+    # Drop the router; the next caller rebuilds it from the new snapshot.
+    if any(getattr(old, k) != getattr(new, k) for k in _ROUTER_SETTINGS):
+        set_llm_router(None)
+
+
+on_settings_change(_on_settings_change)
@@ -0,0 +1,150 @@
+"""Background refresh scheduler for stale-while-revalidate cache entries.
+
+When a `TTLCache` entry passes its TTL but is still inside its stale window,
+the cache serves the old value immediately and hands the reload to this
+scheduler instead of making the caller wait:
+
+* **Jitter**: each refresh starts after a random delay of up to
+  `CACHE_REFRESH_JITTER_S`, so keys that expire together do not all hit
+  OpenAI / Oracle in the same instant.
+* **Concurrency cap**: at most `CACHE_REFRESH_CONCURRENCY` refreshes run at once.
+* **Priority**: among refreshes that are due, keys read most often run first.
+* **De-duplication**: a key already waiting for a refresh is not queued
+  twice; a repeat request only raises its priority. The backlog is bounded, and
+  excess requests are dropped, since the stale value is still being served.
+
+Refreshes run as the `refresh` tenant (see `services.tenancy`), so their LLM
+spend is visible and can be given a quota.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from opentelemetry import trace
+
+from config import Settings, get_settings, on_settings_change
+from observability.metrics import CACHE_REFRESH_PENDING, CACHE_REFRESHES
+from services.tenancy import REFRESH_TENANT, RequestContext, use_context
+
+RefreshKey = Tuple[str, Hashable]  # (cache name, cache key)
+
+
+class _Task:
+    __slots__ = ("key", "fn", "priority", "due")
+
+    def __init__(self, key: RefreshKey, fn: Callable[[], str], priority: float, due: float) -> None:
+        self.key = key
+        self.fn = fn
+        self.priority = priority
+        self.due = due
+
+
+class RefreshScheduler:
+    """Jittered, priority-ordered, concurrency-capped background refreshes."""
+
+    def __init__(self, max_concurrency: int = 2, jitter_s: float = 5.0, max_pending: int = 1024) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+        self.jitter_s = max(0.0, jitter_s)
+        self._max_pending = max_pending
+        self._cond = threading.Condition()
+        self._tasks: Dict[RefreshKey, _Task] = {}
+        self._delayed: List[Tuple[float, int, _Task]] = []  # Waiting for their jittered start.
+        self._ready: List[Tuple[float, int, _Task]] = []  # Due; ordered by -priority.
+        self._seq = itertools.count()
+        self._running = 0
+        self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="cache-refresh")
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, key: RefreshKey, fn: Callable[[], str], priority: float = 0.0) -> bool:
+        """Queue `fn` to refresh `key`; returns False if already queued or the backlog is full.
+
+        `fn` returns an outcome label for `agentic_cache_refreshes_total`.
+        """
+        with self._cond:
+            task = self._tasks.get(key)
+            if task is not None:
+                task.priority = max(task.priority, priority)
+                return False
+            if len(self._tasks) >= self._max_pending:
+                CACHE_REFRESHES.labels(cache=key[0], outcome="dropped").inc()
+                return False
+            due = time.monotonic() + random.uniform(0.0, self.jitter_s)
+            task = self._tasks[key] = _Task(key, fn, priority, due)
+            heapq.heappush(self._delayed, (due, next(self._seq), task))
+            CACHE_REFRESH_PENDING.set(len(self._tasks))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch, name="cache-refresh-scheduler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return True
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._tasks)
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, seq, task = heapq.heappop(self._delayed)
+                    # Priority is read when the task becomes due, so bumps while waiting count.
+                    heapq.heappush(self._ready, (-task.priority, seq, task))
+                if self._ready and self._running < self.max_concurrency:
+                    _, _, task = heapq.heappop(self._ready)
+                    self._running += 1
+                else:
+                    timeout = self._delayed[0][0] - now if self._delayed else None
+                    self._cond.wait(timeout)
+                    continue
+            self._pool.submit(self._run, task)
+
+    def _run(self, task: _Task) -> None:
+        tracer = trace.get_tracer(__name__)
+        outcome = "error"
+        try:
+            with use_context(RequestContext(tenant=REFRESH_TENANT)):
+                with tracer.start_as_current_span("cache.refresh") as span:
+                    span.set_attribute("cache.name", task.key[0])
+                    span.set_attribute("cache.priority", task.priority)
+                    outcome = task.fn()
+        except Exception:
+            outcome = "error"
+        finally:
+            CACHE_REFRESHES.labels(cache=task.key[0], outcome=outcome).inc()
+            with self._cond:
+                self._running -= 1
+                self._tasks.pop(task.key, None)
+                CACHE_REFRESH_PENDING.set(len(self._tasks))
+                self._cond.notify()
+
+
+_SCHEDULER: Optional[RefreshScheduler] = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_refresh_scheduler() -> RefreshScheduler:
+    """Process-wide scheduler built from settings on first use."""
+    global _SCHEDULER
+    if _SCHEDULER is None:
+        with _SCHEDULER_LOCK:
+            if _SCHEDULER is None:
+                settings = get_settings()
+                _SCHEDULER = RefreshScheduler(settings.cache_refresh_concurrency, settings.cache_refresh_jitter_s)
+    return _SCHEDULER
+
+
+def _on_settings_change(old: Settings, new: Settings) -> None:
+    if _SCHEDULER is not None:
+        # Jitter applies to new refreshes immediately; the pool size stays until restart.
+        _SCHEDULER.jitter_s = max(0.0, new.cache_refresh_jitter_s)
+
+
+on_settings_change(_on_settings_change)
@@ -0,0 +1,130 @@
+"""Append-only, fsync'd JSONL log of batch requests and their results.
+
+Writers call `append()` and return immediately. A background thread drains
+the queue and writes everything pending as one group: a single `write`, one
+`flush` and one `fsync` per batch rather than per record. Durability costs one
+disk sync per `FLUSH_INTERVAL_S` instead of one per request. `close()` (or
+`flush()`) blocks until everything appended so far is on disk. If a write
+fails (e.g. disk full), the writer stops and `append()` / `flush()` raise that
+error instead of hanging.
+
+On restart, `load_latest()` replays the log and returns the last record per
+key, so a batch runner can skip work that already completed. A torn final
+line from a crash is ignored.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+FLUSH_INTERVAL_S = 0.2
+MAX_BATCH = 256
+
+
+class RequestLog:
+    """Group-committing JSONL writer."""
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(self.path, "a", encoding="utf-8")
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue()
+        self._synced = threading.Condition()
+        self._appended = 0
+        self._written = 0
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._writer, name="request-log", daemon=True)
+        self._thread.start()
+
+    def append(self, record: dict) -> None:
+        if self._closed:
+            raise RuntimeError("request log is closed")
+        self._raise_if_failed()
+        record.setdefault("ts", time.time())
+        with self._synced:
+            self._appended += 1
+        self._queue.put(record)
+
+    def flush(self) -> None:
+        """Block until every record appended so far has been fsync'd."""
+        with self._synced:
+            target = self._appended
+            self._synced.wait_for(lambda: self._written >= target or self._error is not None)
+        self._raise_if_failed()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+            self._fh.close()
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise OSError(f"request log {self.path} is no longer writable: {self._error}") from self._error
+
+    def __enter__(self) -> "RequestLog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _writer(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch: List[dict] = [first]
+            # Give concurrent writers a moment to join this group commit.
+            deadline = time.monotonic() + FLUSH_INTERVAL_S
+            while len(batch) < MAX_BATCH:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)  # Re-queue the sentinel for the outer loop.
+                    break
+                batch.append(item)
+
+            try:
+                self._fh.write("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in batch))
+                self._fh.flush()
+                os.fsync(self._fh.fileno())
+            except Exception as exc:
+                # Wake everyone blocked in flush(); they re-raise the stored error.
+                with self._synced:
+                    self._error = exc
+                    self._synced.notify_all()
+                return
+            with self._synced:
+                self._written += len(batch)
+                self._synced.notify_all()
+
+
+def load_latest(path: str) -> Dict[str, dict]:
+    """Return the last record per `key` (later lines win); tolerant of a torn tail."""
+    latest: Dict[str, dict] = {}
+    if not os.path.exists(path):
+        return latest
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            key = record.get("key")
+            if key:
+                latest[key] = record
+    return latest
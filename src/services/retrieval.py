@@ -0,0 +1,280 @@
+"""Parallel multi-source retrieval stage feeding the LLM summarizer.
+
+A `Retriever` fans a query out to every configured `RetrievalSource` at once
+(DuckDuckGo, the local document index, ...), merges the returned snippets and
+drops duplicates by content hash. It returns as soon as either
+
+* enough distinct snippets have arrived (`min_snippets`), or
+* the deadline expires,
+
+so summarization never waits for the slowest source. Late results are simply
+discarded. Sources are selected with `RESEARCH_SOURCES` (default
+`duckduckgo,local`) and new ones can be added via `SOURCE_FACTORIES`.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+import requests
+from opentelemetry import trace
+
+from config import Settings, get_settings, on_settings_change
+from services.circuit_breaker import CircuitBreaker
+from services.doc_index import DocumentIndex, get_document_index
+
+_WS_RE = re.compile(r"\s+")
+
+
+@dataclass(frozen=True)
+class Snippet:
+    """One piece of context returned by a source."""
+
+    text: str
+    source: str
+    url: str = ""
+    title: str = ""
+
+    @property
+    def content_hash(self) -> str:
+        normalized = _WS_RE.sub(" ", self.text).strip().lower()
+        return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class RetrievalResult:
+    """Merged snippets plus per-source bookkeeping for spans and metrics."""
+
+    snippets: List[Snippet] = field(default_factory=list)
+    succeeded: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    pending: List[str] = field(default_factory=list)  # Cut off by deadline/early return.
+    partial: bool = False  # Deadline hit with sources pending and fewer than `min_snippets`.
+
+
+class RetrievalSource(ABC):
+    """Base class for pluggable sources; `fetch` may raise on failure."""
+
+    name: str = "base"
+
+    @abstractmethod
+    def fetch(self, query: str) -> List[Snippet]:
+        """Snippets for `query`, best first."""
+
+
+class DuckDuckGoSource(RetrievalSource):
+    """DuckDuckGo Instant Answer API (no key required).
+
+    The fetch sits behind the `search.duckduckgo` circuit breaker, so an outage
+    costs nothing per request instead of a full HTTP timeout. Queries that
+    DuckDuckGo answered with no results are negatively cached for a few minutes.
+    """
+
+    name = "duckduckgo"
+    NEGATIVE_CACHE_TTL_S = 300.0
+    NEGATIVE_CACHE_MAX_ENTRIES = 1024
+
+    DEFAULT_TIMEOUT_S = 10.0
+
+    def __init__(self, max_topics: int = 8, timeout_s: float = DEFAULT_TIMEOUT_S) -> None:
+        self._max_topics = max_topics
+        self._timeout_s = timeout_s
+        self.breaker = CircuitBreaker("search.duckduckgo", failure_threshold=3, recovery_timeout_s=30.0)
+        # Negative cache: query -> expiry (monotonic seconds) for known-empty results.
+        self._negative_cache: "OrderedDict[str, float]" = OrderedDict()
+        self._negative_lock = threading.Lock()
+
+    def fetch(self, query: str) -> List[Snippet]:
+        if self._is_known_empty(query):
+            return []
+
+        search_data = self.breaker.call(self._get, query)
+
+        snippets: List[Snippet] = []
+        abstract = search_data.get("Abstract", "")
+        if abstract:
+            snippets.append(
+                Snippet(abstract, self.name, url=search_data.get("AbstractURL", ""), title="Overview")
+            )
+
+        # RelatedTopics mixes plain topics with named groups holding nested "Topics".
+        topics: List[dict] = []
+        for topic in search_data.get("RelatedTopics", []):
+            if isinstance(topic, dict):
+                topics.extend(topic.get("Topics", [topic]))
+        for topic in topics[: self._max_topics]:
+            if isinstance(topic, dict) and topic.get("Text"):
+                snippets.append(Snippet(topic["Text"], self.name, url=topic.get("FirstURL", "")))
+
+        if not snippets:
+            self._remember_empty(query)
+        return snippets
+
+    def _get(self, query: str) -> dict:
+        resp = requests.get(
+            "https://api.duckduckgo.com/",
+            params={"q": query, "format": "json"},
+            timeout=self._timeout_s,
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    def _is_known_empty(self, query: str) -> bool:
+        with self._negative_lock:
+            expires_at = self._negative_cache.get(query)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._negative_cache[query]
+                return False
+            return True
+
+    def _remember_empty(self, query: str) -> None:
+        with self._negative_lock:
+            self._negative_cache[query] = time.monotonic() + self.NEGATIVE_CACHE_TTL_S
+            self._negative_cache.move_to_end(query)
+            while len(self._negative_cache) > self.NEGATIVE_CACHE_MAX_ENTRIES:
+                self._negative_cache.popitem(last=False)
+
+
+class LocalIndexSource(RetrievalSource):
+    """BM25 lookup in the local document index (`services.doc_index`); no network."""
+
+    name = "local"
+
+    def __init__(self, index: DocumentIndex, max_results: int = 3) -> None:
+        self._index = index
+        self._max_results = max_results
+
+    def fetch(self, query: str) -> List[Snippet]:
+        return [
+            Snippet(hit.text, self.name, url=hit.uri, title=hit.title)
+            for hit in self._index.search(query, k=self._max_results)
+        ]
+
+
+# Name -> factory used by `build_retriever`; extend to plug in more sources.
+SOURCE_FACTORIES: Dict[str, Callable[[Settings], RetrievalSource]] = {
+    # Never wait longer than the retriever will: abandoned fetches hold a shared worker.
+    "duckduckgo": lambda settings: DuckDuckGoSource(
+        timeout_s=min(DuckDuckGoSource.DEFAULT_TIMEOUT_S, settings.retrieval_deadline_s)
+    ),
+    "local": lambda settings: LocalIndexSource(get_document_index()),
+}
+
+# Shared pool: a `with` block would join stragglers and defeat the deadline.
+_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="retrieval")
+
+
+class Retriever:
+    """Fan out to all sources concurrently and merge what arrives in time."""
+
+    def __init__(
+        self,
+        sources: Sequence[RetrievalSource],
+        deadline_s: float = 3.0,
+        min_snippets: int = 4,
+        max_snippets: int = 8,
+    ) -> None:
+        self.sources = list(sources)
+        self._deadline_s = deadline_s
+        self._min_snippets = min_snippets
+        self._max_snippets = max_snippets
+
+    def retrieve(self, query: str) -> RetrievalResult:
+        tracer = trace.get_tracer(__name__)
+        with tracer.start_as_current_span("retrieval.fan_out") as span:
+            span.set_attribute("retrieval.sources", len(self.sources))
+            result = RetrievalResult()
+            seen: set = set()
+
+            futures: Dict[Future, RetrievalSource] = {}
+            for source in self.sources:
+                # Copy the context so per-source spans nest under this one.
+                ctx = contextvars.copy_context()
+                futures[_EXECUTOR.submit(ctx.run, self._fetch_one, source, query)] = source
+
+            deadline = time.monotonic() + self._deadline_s
+            pending = set(futures)
+            while pending and len(result.snippets) < self._min_snippets:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    source = futures[future]
+                    try:
+                        snippets = future.result()
+                    except Exception as exc:
+                        result.failed[source.name] = str(exc)
+                        continue
+                    result.succeeded.append(source.name)
+                    for snippet in snippets:
+                        digest = snippet.content_hash
+                        if digest not in seen and len(result.snippets) < self._max_snippets:
+                            seen.add(digest)
+                            result.snippets.append(snippet)
+
+            result.pending = [futures[f].name for f in pending]
+            result.partial = bool(pending) and len(result.snippets) < self._min_snippets
+            span.set_attribute("retrieval.snippets", len(result.snippets))
+            span.set_attribute("retrieval.succeeded", ",".join(result.succeeded))
+            span.set_attribute("retrieval.failed", ",".join(result.failed))
+            span.set_attribute("retrieval.cut_off", ",".join(result.pending))
+            return result
+
+    @staticmethod
+    def _fetch_one(source: RetrievalSource, query: str) -> List[Snippet]:
+        tracer = trace.get_tracer(__name__)
+        with tracer.start_as_current_span(f"retrieval.source.{source.name}") as span:
+            snippets = source.fetch(query)
+            span.set_attribute("retrieval.snippets", len(snippets))
+            return snippets
+
+
+def build_retriever(settings: Settings) -> Retriever:
+    """Instantiate the sources listed in settings (unknown names are ignored)."""
+    sources = [SOURCE_FACTORIES[name](settings) for name in settings.research_sources if name in SOURCE_FACTORIES]
+    return Retriever(sources, deadline_s=settings.retrieval_deadline_s)
+
+
+_RETRIEVER: Optional[Retriever] = None
+_RETRIEVER_LOCK = threading.Lock()
+
+
+def get_retriever() -> Retriever:
+    """Return the process-wide retriever, building it from settings on first use."""
+    global _RETRIEVER
+    if _RETRIEVER is None:
+        with _RETRIEVER_LOCK:
+            if _RETRIEVER is None:
+                _RETRIEVER = build_retriever(get_settings())
+    return _RETRIEVER
+
+
+def set_retriever(retriever: Optional[Retriever]) -> None:
+    """Swap the process-wide retriever (tests, load tools, config reloads)."""
+    global _RETRIEVER
+    with _RETRIEVER_LOCK:
+        _RETRIEVER = retriever
+
+
+_RETRIEVER_SETTINGS = ("research_sources", "retrieval_deadline_s", "doc_index_dir")
+
+
+def _on_settings_change(old: Settings, new: Settings) -> None:
+    # Rebuilt lazily so the document index listener has run before we need it.
+    if any(getattr(old, k) != getattr(new, k) for k in _RETRIEVER_SETTINGS):
+        set_retriever(None)
+
+
+on_settings_change(_on_settings_change)
@@ -0,0 +1,284 @@
+"""Per-tenant and per-session accounting with bounded-cardinality metrics.
+
+A `RequestContext` (tenant, session id) is set for the duration of each
+`run_graph_result` call. It lives in a `contextvars.ContextVar`, so it reaches
+the services (LLM router, caches) without being threaded through every
+signature. It also follows the work into LangGraph nodes and the retrieval
+thread pool, which both run tasks in a copied context.
+
+`TenantAccounting` then:
+
+* attributes requests, latency, LLM tokens and USD cost to the tenant;
+* enforces a per-tenant USD quota per window (`TENANT_QUOTA_USD`,
+  `TENANT_QUOTAS`, `TENANT_QUOTA_WINDOW_S`). Over-budget tenants are rejected
+  with `QuotaExceededError` when the request starts and again before each LLM
+  call, so no new LLM spend is made. Requests already in flight can overshoot
+  by at most their own calls;
+* tracks sessions and observes how many queries each one made once it has
+  been idle for `SESSION_IDLE_S`.
+
+Tenant ids supplied by clients (e.g. Streamlit's `?tenant=`) go through
+`resolve_tenant`. Only tenants configured in `TENANT_QUOTAS` can be selected;
+anything else runs as `DEFAULT_TENANT`. A made-up name therefore cannot buy a
+fresh quota, and the spend table stays bounded.
+
+Tenant ids still never go straight into Prometheus labels. A Space-Saving heavy-hitter sketch estimates the busiest tenants. The
+first `TENANT_LABEL_TOP_K` tenants that prove to be heavy get their own
+label, and everybody else is reported as `other`. Admitted labels are sticky,
+so a series never flips between a name and `other`, and the label set never
+grows beyond K + 1.
+"""
+
+from __future__ import annotations
+
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from config import Settings, get_settings, on_settings_change
+from observability.metrics import (
+    ACTIVE_SESSIONS,
+    SESSION_QUERIES,
+    TENANT_LLM_COST_USD,
+    TENANT_LLM_TOKENS,
+    TENANT_QUOTA_REJECTIONS,
+    TENANT_REQUEST_LATENCY,
+    TENANT_REQUESTS,
+)
+
+OTHER_LABEL = "other"
+WARMUP_TENANT = "warmup"
+REFRESH_TENANT = "refresh"
+# Guaranteed request count a tenant needs before it earns its own label.
+MIN_REQUESTS_FOR_LABEL = 10
+
+
+@dataclass(frozen=True, slots=True)
+class RequestContext:
+    """Who a request is for; carried implicitly via a context variable."""
+
+    tenant: str = "default"
+    session_id: str = ""
+
+
+_CURRENT: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+
+
+def current_context() -> RequestContext:
+    """The active request context, or the configured default tenant outside a request."""
+    ctx = _CURRENT.get()
+    return ctx if ctx is not None else RequestContext(tenant=get_settings().default_tenant)
+
+
+def resolve_tenant(requested: str, settings: Optional[Settings] = None) -> str:
+    """Map a client-supplied tenant id to a configured tenant (unknown ids: the default)."""
+    settings = settings or get_settings()
+    requested = requested.strip()
+    if requested and requested in dict(settings.tenant_quotas):
+        return requested
+    return settings.default_tenant
+
+
+@contextmanager
+def use_context(ctx: RequestContext) -> Iterator[RequestContext]:
+    token = _CURRENT.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _CURRENT.reset(token)
+
+
+class QuotaExceededError(RuntimeError):
+    """Raised before any LLM spend when a tenant has used up its quota."""
+
+    def __init__(self, tenant: str, spent_usd: float, quota_usd: float) -> None:
+        super().__init__(f"tenant '{tenant}' exceeded its quota (${spent_usd:.4f} of ${quota_usd:.4f})")
+        self.tenant = tenant
+        self.spent_usd = spent_usd
+        self.quota_usd = quota_usd
+
+
+class SpaceSaving:
+    """Space-Saving heavy-hitter sketch (Metwally et al.) over at most `capacity` keys.
+
+    Estimates overcount by at most the count of the slot a key took over; that
+    bound is kept per key so `guaranteed()` is a safe lower bound.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self._capacity = max(1, capacity)
+        self._counts: Dict[str, float] = {}
+        self._errors: Dict[str, float] = {}
+
+    def offer(self, key: str, weight: float = 1.0) -> None:
+        if key in self._counts:
+            self._counts[key] += weight
+        elif len(self._counts) < self._capacity:
+            self._counts[key] = weight
+            self._errors[key] = 0.0
+        else:
+            victim = min(self._counts, key=self._counts.__getitem__)
+            floor = self._counts.pop(victim)
+            del self._errors[victim]
+            self._counts[key] = floor + weight
+            self._errors[key] = floor
+
+    def estimate(self, key: str) -> float:
+        return self._counts.get(key, 0.0)
+
+    def guaranteed(self, key: str) -> float:
+        return self._counts.get(key, 0.0) - self._errors.get(key, 0.0)
+
+    def top(self, k: int) -> List[Tuple[str, float]]:
+        return heapq.nlargest(k, self._counts.items(), key=lambda item: item[1])
+
+
+class TenantLabeler:
+    """Map tenant ids to a bounded set of Prometheus label values."""
+
+    def __init__(self, max_labels: int = 20, always: Tuple[str, ...] = ()) -> None:
+        self._max_labels = max_labels
+        # A few times K candidates keeps estimates accurate for the top K.
+        self._sketch = SpaceSaving(4 * max_labels)
+        self._admitted: Set[str] = set(always)
+        self._lock = threading.Lock()
+
+    def observe(self, tenant: str) -> str:
+        """Count one request for `tenant` and return its label."""
+        with self._lock:
+            self._sketch.offer(tenant)
+            if tenant in self._admitted:
+                return tenant
+            if (
+                len(self._admitted) < self._max_labels
+                and self._sketch.guaranteed(tenant) >= MIN_REQUESTS_FOR_LABEL
+                and tenant in {key for key, _ in self._sketch.top(self._max_labels)}
+            ):
+                self._admitted.add(tenant)
+                return tenant
+            return OTHER_LABEL
+
+    def label(self, tenant: str) -> str:
+        """Label for `tenant` without counting a request."""
+        with self._lock:
+            return tenant if tenant in self._admitted else OTHER_LABEL
+
+    def top(self, k: int) -> List[Tuple[str, float]]:
+        with self._lock:
+            return self._sketch.top(k)
+
+
+class TenantAccounting:
+    """Quota enforcement plus tenant/session attribution of requests and LLM spend."""
+
+    def __init__(self, settings: Settings) -> None:
+        self._lock = threading.Lock()
+        self._spent: Dict[str, float] = {}
+        self._lifetime: Dict[str, float] = {}  # Never reset; for budgets spanning windows.
+        self._window_epoch = 0
+        self._sessions: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+        self.labeler = TenantLabeler(
+            settings.tenant_label_top_k,
+            always=(settings.default_tenant, WARMUP_TENANT, REFRESH_TENANT),
+        )
+        self.apply_settings(settings)
+
+    def apply_settings(self, settings: Settings) -> None:
+        """Pick up new quotas on a settings reload; spend so far is kept."""
+        with self._lock:
+            self._default_quota = settings.tenant_quota_usd
+            self._quotas = dict(settings.tenant_quotas)
+            self._window_s = settings.tenant_quota_window_s
+            self._session_idle_s = settings.session_idle_s
+
+    def quota_for(self, tenant: str) -> float:
+        """USD per window; 0 means unlimited."""
+        return self._quotas.get(tenant, self._default_quota)
+
+    def spent(self, tenant: str) -> float:
+        with self._lock:
+            self._roll_window(time.time())
+            return self._spent.get(tenant, 0.0)
+
+    def lifetime_spent(self, tenant: str) -> float:
+        """USD spent by `tenant` since process start (not reset by quota windows)."""
+        with self._lock:
+            return self._lifetime.get(tenant, 0.0)
+
+    def check_quota(self, tenant: str) -> None:
+        quota = self.quota_for(tenant)
+        if quota <= 0:
+            return
+        spent = self.spent(tenant)
+        if spent >= quota:
+            TENANT_QUOTA_REJECTIONS.labels(tenant=self.labeler.label(tenant)).inc()
+            raise QuotaExceededError(tenant, spent, quota)
+
+    def record_llm(self, tenant: str, prompt_tokens: int, completion_tokens: int, cost_usd: float) -> None:
+        with self._lock:
+            self._roll_window(time.time())
+            self._spent[tenant] = self._spent.get(tenant, 0.0) + cost_usd
+            self._lifetime[tenant] = self._lifetime.get(tenant, 0.0) + cost_usd
+        label = self.labeler.label(tenant)
+        TENANT_LLM_TOKENS.labels(tenant=label, kind="prompt").inc(prompt_tokens)
+        TENANT_LLM_TOKENS.labels(tenant=label, kind="completion").inc(completion_tokens)
+        TENANT_LLM_COST_USD.labels(tenant=label).inc(cost_usd)
+
+    def record_request(self, ctx: RequestContext, seconds: float, outcome: str) -> None:
+        label = self.labeler.observe(ctx.tenant)
+        TENANT_REQUESTS.labels(tenant=label, outcome=outcome).inc()
+        TENANT_REQUEST_LATENCY.labels(tenant=label).observe(seconds)
+        if ctx.session_id:
+            self._touch_session(ctx.session_id)
+
+    def _touch_session(self, session_id: str) -> None:
+        now = time.monotonic()
+        finished: List[int] = []
+        with self._lock:
+            _, count = self._sessions.pop(session_id, (now, 0))
+            self._sessions[session_id] = (now, count + 1)
+            # Oldest-first order: expire idle sessions from the front.
+            while self._sessions:
+                oldest, (last_seen, queries) = next(iter(self._sessions.items()))
+                if now - last_seen < self._session_idle_s:
+                    break
+                del self._sessions[oldest]
+                finished.append(queries)
+            active = len(self._sessions)
+        for queries in finished:
+            SESSION_QUERIES.observe(queries)
+        ACTIVE_SESSIONS.set(active)
+
+    def _roll_window(self, now: float) -> None:
+        # Fixed windows aligned to the epoch (e.g. UTC days): spend resets together.
+        epoch = int(now // self._window_s)
+        if epoch != self._window_epoch:
+            self._window_epoch = epoch
+            self._spent.clear()
+
+
+_ACCOUNTING: Optional[TenantAccounting] = None
+_ACCOUNTING_LOCK = threading.Lock()
+
+
+def get_accounting() -> TenantAccounting:
+    """Process-wide accounting, built from settings on first use."""
+    global _ACCOUNTING
+    if _ACCOUNTING is None:
+        with _ACCOUNTING_LOCK:
+            if _ACCOUNTING is None:
+                _ACCOUNTING = TenantAccounting(get_settings())
+    return _ACCOUNTING
+
+
+def _on_settings_change(old: Settings, new: Settings) -> None:
+    if _ACCOUNTING is not None:
+        _ACCOUNTING.apply_settings(new)
+
+
+on_settings_change(_on_settings_change)
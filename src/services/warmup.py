@@ -0,0 +1,265 @@
+"""Warm the stage caches with the most popular queries after a deploy.
+
+Two pieces:
+
+* `QueryStats` counts every query handled by `run_graph` (the same traffic that
+  drives `QUERIES_PER_SESSION`) and persists the counts to `QUERY_STATS_PATH`,
+  so the hot set survives restarts. Saving happens on a background timer and
+  at exit, never on the request thread, and the table keeps only the
+  `MAX_QUERIES` most frequent queries. A query log file (`WARMUP_QUERY_LOG`,
+  plain lines or JSONL) can seed it as well.
+* `CacheWarmer` pre-executes the top-N queries in a background thread through
+  the same stage functions the graph uses. That fills the search, summary and
+  trends caches without touching request KPIs. It is bounded by a concurrency
+  cap (`WARMUP_CONCURRENCY`) and an LLM spend budget (`WARMUP_BUDGET_USD`,
+  counted on the `warmup` tenant only), and can repeat on a schedule
+  (`WARMUP_INTERVAL_S`).
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Sequence
+
+from opentelemetry import trace
+
+from config import Settings, get_settings
+from observability.metrics import WARMUP_QUERIES
+from services.cache import normalize_key
+from services.tenancy import WARMUP_TENANT, RequestContext, get_accounting, use_context
+
+Stage = Callable[[str], object]
+
+
+def iter_query_file(path: str) -> Iterator[str]:
+    """Yield queries from a text file (one per line) or JSONL.
+
+    JSONL records may carry the text in `query`, `title` or `body`
+    (in that order of preference), so request logs can be replayed directly.
+    """
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                text = record.get("query") or record.get("title") or record.get("body") or ""
+                if text:
+                    yield str(text).strip()
+            else:
+                yield line
+
+
+class QueryStats:
+    """Thread-safe query frequency table persisted as JSON."""
+
+    SAVE_INTERVAL_S = 30.0
+    # Only the hottest queries matter for warm-up; the long tail is pruned.
+    MAX_QUERIES = 1000
+
+    def __init__(self, path: str = "") -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._counts: Counter = Counter()
+        # Display form of each normalized key (first spelling seen wins).
+        self._display: dict = {}
+        self._dirty = False
+        self._autosave: Optional[threading.Thread] = None
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as fh:
+                    for query, count in json.load(fh).items():
+                        self._add(query, int(count))
+            except (OSError, ValueError):
+                pass  # A corrupt stats file only costs us the warm-up.
+
+    def record(self, query: str, count: int = 1) -> None:
+        if not query.strip():
+            return
+        with self._lock:
+            self._add(query, count)
+            self._dirty = True
+
+    def load_log(self, path: str) -> None:
+        for query in iter_query_file(path):
+            self.record(query)
+
+    def top(self, n: int, seed: Optional["QueryStats"] = None) -> List[str]:
+        """Most frequent queries, optionally combined with a (non-persisted) seed table."""
+        with self._lock:
+            counts = Counter(self._counts)
+            display = dict(self._display)
+        if seed is not None:
+            with seed._lock:
+                counts.update(seed._counts)
+                for key, text in seed._display.items():
+                    display.setdefault(key, text)
+        return [display[key] for key, _ in counts.most_common(n)]
+
+    def save(self) -> None:
+        """Write the table atomically; failures are ignored (the stats are best effort)."""
+        if not self._path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                payload = {self._display[key]: count for key, count in self._counts.items()}
+                self._dirty = False
+            path = Path(self._path)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                        json.dump(payload, fh)
+                    os.replace(tmp, path)
+                except BaseException:
+                    os.unlink(tmp)
+                    raise
+            except OSError:
+                with self._lock:
+                    self._dirty = True  # Try again on the next tick.
+
+    def start_autosave(self, interval_s: float = SAVE_INTERVAL_S) -> None:
+        """Save in a daemon thread every `interval_s` while there are new counts."""
+        if not self._path or self._autosave is not None:
+            return
+
+        def loop() -> None:
+            while True:
+                time.sleep(interval_s)
+                self.save()
+
+        self._autosave = threading.Thread(target=loop, name="query-stats-save", daemon=True)
+        self._autosave.start()
+
+    def _add(self, query: str, count: int) -> None:
+        key = normalize_key(query)
+        self._display.setdefault(key, query.strip())
+        self._counts[key] += count
+        if len(self._counts) > 2 * self.MAX_QUERIES:
+            # Amortized prune back to the top MAX_QUERIES (guarded by the caller's lock).
+            keep = dict(self._counts.most_common(self.MAX_QUERIES))
+            self._counts = Counter(keep)
+            self._display = {key: self._display[key] for key in keep}
+
+
+_STATS: Optional[QueryStats] = None
+_STATS_LOCK = threading.Lock()
+
+
+def get_query_stats() -> QueryStats:
+    """Process-wide stats instance, saved periodically and at interpreter exit."""
+    global _STATS
+    if _STATS is None:
+        with _STATS_LOCK:
+            if _STATS is None:
+                _STATS = QueryStats(get_settings().query_stats_path)
+                _STATS.start_autosave()
+                atexit.register(_STATS.save)
+    return _STATS
+
+
+def record_query(query: str) -> None:
+    get_query_stats().record(query)
+
+
+class CacheWarmer:
+    """Run stage functions for hot queries under a concurrency and cost budget."""
+
+    def __init__(
+        self,
+        stages: Sequence[Stage],
+        max_concurrency: int = 2,
+        budget_usd: float = 0.05,
+    ) -> None:
+        self._stages = list(stages)
+        self._max_concurrency = max(1, max_concurrency)
+        self._budget_usd = budget_usd
+        self._stop = threading.Event()
+
+    def warm(self, queries: Sequence[str]) -> int:
+        """Pre-execute `queries`; returns how many completed. Blocks until done."""
+        tracer = trace.get_tracer(__name__)
+        accounting = get_accounting()
+        # Only warm-up spend counts: user traffic and router rebuilds don't affect it.
+        start_cost = accounting.lifetime_spent(WARMUP_TENANT)
+        budget_hit = threading.Event()
+        completed = [0]
+        lock = threading.Lock()
+
+        def run(query: str) -> None:
+            # Checked per query: in-flight calls may overshoot by at most
+            # `max_concurrency` requests' worth of spend.
+            if self._stop.is_set() or accounting.lifetime_spent(WARMUP_TENANT) - start_cost >= self._budget_usd:
+                budget_hit.set()
+                WARMUP_QUERIES.labels(outcome="skipped_budget").inc()
+                return
+            try:
+                # Attributed to a dedicated tenant so warm-up spend is visible and quota-able.
+                with use_context(RequestContext(tenant=WARMUP_TENANT)):
+                    for stage in self._stages:
+                        stage(query)
+            except Exception:
+                WARMUP_QUERIES.labels(outcome="error").inc()
+                return
+            WARMUP_QUERIES.labels(outcome="success").inc()
+            with lock:
+                completed[0] += 1
+
+        with tracer.start_as_current_span("warmup.run") as span:
+            span.set_attribute("warmup.queries", len(queries))
+            with ThreadPoolExecutor(max_workers=self._max_concurrency, thread_name_prefix="warmup") as pool:
+                list(pool.map(run, queries))
+            span.set_attribute("warmup.completed", completed[0])
+            span.set_attribute("warmup.cost_usd", accounting.lifetime_spent(WARMUP_TENANT) - start_cost)
+            span.set_attribute("warmup.budget_exhausted", budget_hit.is_set())
+        return completed[0]
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def wait_stopped(self, timeout: float) -> bool:
+        return self._stop.wait(timeout)
+
+
+def start_warmup(stages: Sequence[Stage], settings: Optional[Settings] = None) -> Optional[threading.Thread]:
+    """Warm the top-N queries in a daemon thread; repeat every interval if set."""
+    settings = settings or get_settings()
+    if settings.warmup_top_n <= 0:
+        return None
+
+    stats = get_query_stats()
+    # The query log only seeds the ranking; it is not folded into the persisted stats.
+    seed: Optional[QueryStats] = None
+    if settings.warmup_query_log and os.path.exists(settings.warmup_query_log):
+        seed = QueryStats()
+        seed.load_log(settings.warmup_query_log)
+
+    warmer = CacheWarmer(stages, settings.warmup_concurrency, settings.warmup_budget_usd)
+
+    def loop() -> None:
+        while True:
+            queries = stats.top(settings.warmup_top_n, seed)
+            if queries:
+                warmer.warm(queries)
+            if settings.warmup_interval_s <= 0 or warmer.wait_stopped(settings.warmup_interval_s):
+                return
+
+    thread = threading.Thread(target=loop, name="cache-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -1,134 +1,171 @@
-"""Web search + OpenAI summarization pipeline with observability."""
+"""Web search + LLM summarization pipeline with observability.
+
+Context comes from `services.retrieval`, which queries DuckDuckGo and the local
+document folder in parallel. LLM calls go through `services.llm_router`, which
+picks a provider per request. Both the retrieval result and the final summary
+are cached per query (`services.cache`), so repeated questions cost nothing.
+
+`research_and_summarize` returns a typed `SearchSummary` (text + sources +
+failure flags); `web_search_and_summarize` is the plain-text wrapper.
+"""
 
 from __future__ import annotations
 
-import requests
-from openai import OpenAI
 from opentelemetry import trace
 
 from config import get_settings
-from observability.metrics import (
-    LLM_REQUEST_LATENCY,
-    TOTAL_PROMPT_TOKENS,
-    TOTAL_COMPLETION_TOKENS,
-    TOTAL_COST_USD,
-    UNANSWERABLE_QUERY_COUNTER,
-)
-
-# Model pricing per 1K tokens (USD)
-MODEL_PRICING = {
-    "gpt-4o-mini": {"prompt": 0.00015, "completion": 0.0006},
-}
-
+from models import SearchSummary, SourceRef
+from observability.metrics import UNANSWERABLE_QUERY_COUNTER
+from services.cache import SEARCH_CACHE, SUMMARY_CACHE, normalize_key
+from services.llm_router import MODEL_PRICING, estimate_llm_cost_usd, get_llm_router  # noqa: F401 (re-export)
+from services.retrieval import get_retriever
+from services.tenancy import QuotaExceededError
 
-def estimate_llm_cost_usd(model: str, prompt_tokens: int, completion_tokens: int) -> float:
-    """Estimate LLM cost in USD based on token usage and model pricing."""
-    pricing = MODEL_PRICING.get(model, MODEL_PRICING["gpt-4o-mini"])
-    return ((prompt_tokens / 1000.0) * pricing["prompt"]) + ((completion_tokens / 1000.0) * pricing["completion"])
+LLM_FAILURE_PREFIX = "LLM summarization failed"
 
 
 def web_search_and_summarize(query: str) -> str:
     """Perform a web search and use an LLM (OpenAI by default) to summarize."""
+    return research_and_summarize(query).text
+
+
+def research_and_summarize(query: str) -> SearchSummary:
+    """Structured variant of `web_search_and_summarize` (cached per query)."""
 
     tracer = trace.get_tracer(__name__)
-    settings = get_settings()
-    client = OpenAI(api_key=settings.llm_api_key or None)
 
     # Wrap the entire operation in a span so downstream calls nest nicely.
     with tracer.start_as_current_span("web_search_and_summarize") as span:
         span.set_attribute("search.query", query)
+        loaded = []
+
+        def load() -> SearchSummary:
+            loaded.append(True)
+            return _search_and_summarize(query, span)
+
+        summary = SUMMARY_CACHE.get_or_load(
+            normalize_key(query),
+            load,
+            # Same rule as SEARCH_CACHE: anything built from a failed or cut-off
+            # retrieval is recomputed, so a recovered source is picked up.
+            should_cache=lambda s: not (s.llm_failed or s.search_failed or s.partial or s.failed_sources),
+            # Background refreshes report into their own `cache.refresh` span.
+            refresher=lambda: _search_and_summarize(query, trace.get_current_span()),
+        )
+        span.set_attribute("summary.cache_hit", not loaded)
+        span.set_attribute("summary.length", len(summary.text))
+        span.set_attribute("summary.sources", len(summary.sources))
+        return summary
 
-        # Perform a real web search using a simple API (DuckDuckGo Instant Answer API is free)
-        try:
-            # Using DuckDuckGo Instant Answer API (no key required)
-            resp = requests.get(
-                "https://api.duckduckgo.com/",
-                params={"q": query, "format": "json"},
-                timeout=10
-            )
-            resp.raise_for_status()
-            search_data = resp.json()
-            
-            # Extract relevant info from DuckDuckGo response
-            abstract = search_data.get("Abstract", "")
-            related_topics = search_data.get("RelatedTopics", [])
-            
-            # Build context for the LLM
-            context_parts = []
-            if abstract:
-                context_parts.append(f"Overview: {abstract}")
-            
-            for topic in related_topics[:3]:  # Top 3 related topics
-                if isinstance(topic, dict) and "Text" in topic:
-                    context_parts.append(f"- {topic['Text']}")
-            
-            context = "\n".join(context_parts) if context_parts else "No detailed results found."
-            
-        except requests.RequestException as e:
-            context = f"Search failed: {str(e)}"
-            span.set_attribute("search.error", str(e))
-
-        span.set_attribute("search.context_length", len(context))
-
-        # Check for unanswerable queries (no useful results found)
-        if context.strip() == "No detailed results found.":
-            UNANSWERABLE_QUERY_COUNTER.inc()
-            # Do NOT return here; allow the LLM summarization step to still run.
-
-        prompt = f"""You are a helpful research assistant. Based on the search results below about "{query}", provide ONLY a brief 2-3 sentence summary. Do not add any extra commentary, questions, or elaborate beyond the summary.
+
+def _search_and_summarize(query: str, span) -> SearchSummary:
+    """Uncached pipeline: retrieve context, then summarize it with the LLM."""
+    tracer = trace.get_tracer(__name__)
+    settings = get_settings()
+    router = get_llm_router()
+
+    # Fan out to every configured source; returns once enough context arrived.
+    # Results are cached unless a source failed or was cut off by the deadline
+    # with too little context (so recovery / a faster response is picked up).
+    retrieval = SEARCH_CACHE.get_or_load(
+        normalize_key(query),
+        lambda: get_retriever().retrieve(query),
+        should_cache=lambda r: not (r.failed or r.partial),
+    )
+
+    # Build context for the LLM
+    context_parts = []
+    for snippet in retrieval.snippets:
+        if snippet.title == "Overview":
+            context_parts.append(f"Overview: {snippet.text}")
+        else:
+            context_parts.append(f"- {snippet.text}")
+
+    search_failed = unanswerable = False
+    if context_parts:
+        context = "\n".join(context_parts)
+    elif retrieval.failed:
+        search_failed = True
+        errors = "; ".join(f"{name}: {err}" for name, err in retrieval.failed.items())
+        context = f"Search failed: {errors}"
+        span.set_attribute("search.error", errors)
+    else:
+        context = "No detailed results found."
+        unanswerable = True
+
+    sources = tuple(SourceRef(s.source, s.url, s.title) for s in retrieval.snippets)
+    span.set_attribute("search.sources", ",".join(retrieval.succeeded))
+    span.set_attribute("search.partial", retrieval.partial)
+    span.set_attribute("search.context_length", len(context))
+
+    # Check for unanswerable queries (no useful results found)
+    if unanswerable:
+        UNANSWERABLE_QUERY_COUNTER.inc()
+        # Do NOT return here; allow the LLM summarization step to still run.
+
+    prompt = f"""You are a helpful research assistant. Based on the search results below about "{query}", provide ONLY a brief 2-3 sentence summary. Do not add any extra commentary, questions, or elaborate beyond the summary.
 
 Search Results:
 {context}
 
 Provide your summary now (2-3 sentences only):"""
 
-        # Use OpenAI Chat Completions to generate a concise summary
-        try:
-            with tracer.start_as_current_span("llm.summarize") as llm_span:
-                llm_span.set_attribute("llm.provider", settings.llm_provider)
-                llm_span.set_attribute("llm.model", settings.llm_model)
-
-                with LLM_REQUEST_LATENCY.time():
-                    response = client.chat.completions.create(
-                        model=settings.llm_model,
-                        messages=[
-                            {
-                                "role": "system",
-                                "content": "You are a concise research assistant. Provide brief, factual summaries without elaboration.",
-                            },
-                            {
-                                "role": "user",
-                                "content": prompt,
-                            },
-                        ],
-                        temperature=0.2,
-                        max_tokens=400,
-                    )
-
-                summary = response.choices[0].message.content.strip()
-
-                # If summary is too long, truncate it intelligently
-                sentences = summary.split(". ")
-                if len(sentences) > 3:
-                    summary = ". ".join(sentences[:3]) + "."
-
-                llm_span.set_attribute("llm.response_length", len(summary))
-
-                # Extract token usage and update metrics
-                usage = getattr(response, "usage", None)
-                if usage is not None:
-                    prompt_tokens = getattr(usage, "input_tokens", 0) or getattr(usage, "prompt_tokens", 0)
-                    completion_tokens = getattr(usage, "output_tokens", 0) or getattr(usage, "completion_tokens", 0)
-
-                    TOTAL_PROMPT_TOKENS.inc(prompt_tokens)
-                    TOTAL_COMPLETION_TOKENS.inc(completion_tokens)
-
-                    cost_usd = estimate_llm_cost_usd(settings.llm_model, prompt_tokens, completion_tokens)
-                    TOTAL_COST_USD.inc(cost_usd)
-
-        except Exception as e:
-            summary = f"LLM summarization failed (OpenAI): {str(e)}. Raw context: {context[:200]}..."
-            span.set_attribute("llm.error", str(e))
-
-        span.set_attribute("summary.length", len(summary))
-        return summary
+    # Let the router pick the provider (OpenAI by default) and summarize.
+    try:
+        with tracer.start_as_current_span("llm.summarize") as llm_span:
+            llm_span.set_attribute("llm.provider", settings.llm_provider)
+            llm_span.set_attribute("llm.model", settings.llm_model)
+
+            result = router.complete(
+                [
+                    {
+                        "role": "system",
+                        "content": "You are a concise research assistant. Provide brief, factual summaries without elaboration.",
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt,
+                    },
+                ],
+                temperature=0.2,
+                max_tokens=400,
+            )
+
+            # Record which backend actually served the request (may be a fallback).
+            llm_span.set_attribute("llm.provider", result.provider)
+            llm_span.set_attribute("llm.model", result.model)
+
+            summary = result.text
+
+            # If summary is too long, truncate it intelligently
+            sentences = summary.split(". ")
+            if len(sentences) > 3:
+                summary = ". ".join(sentences[:3]) + "."
+
+            llm_span.set_attribute("llm.response_length", len(summary))
+            llm_span.set_attribute("llm.cost_usd", result.cost_usd)
+
+    except QuotaExceededError:
+        raise  # Not an LLM failure: the request is rejected, not answered.
+    except Exception as e:
+        summary = f"{LLM_FAILURE_PREFIX} ({settings.llm_provider}): {str(e)}. Raw context: {context[:200]}..."
+        span.set_attribute("llm.error", str(e))
+        return SearchSummary(
+            text=summary,
+            sources=sources,
+            search_failed=search_failed,
+            unanswerable=unanswerable,
+            llm_failed=True,
+            partial=retrieval.partial,
+            failed_sources=tuple(retrieval.failed),
+        )
+
+    return SearchSummary(
+        text=summary,
+        sources=sources,
+        provider=result.provider,
+        search_failed=search_failed,
+        unanswerable=unanswerable,
+        partial=retrieval.partial,
+        failed_sources=tuple(retrieval.failed),
+    )
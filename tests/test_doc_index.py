@@ -0,0 +1,42 @@
+"""Local document index: relative `RESEARCH_DOCS_DIR` paths must yield usable file URIs."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from services.doc_index import DocumentIndex, local_index_research  # noqa: E402
+from services.retrieval import LocalIndexSource  # noqa: E402
+
+
+def test_ingest_relative_directory_yields_file_uris(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    docs = Path("data/docs")
+    docs.mkdir(parents=True)
+    (docs / "vectors.md").write_text("Oracle vector search stores embeddings next to relational rows.\n")
+
+    index = DocumentIndex("data/index")
+    stats = index.ingest([str(docs)])
+    assert stats.added == 1
+
+    hits = index.search("vector embeddings")
+    assert hits and Path(hits[0].path).is_absolute()
+    assert hits[0].uri == (tmp_path / "data/docs/vectors.md").resolve().as_uri()
+
+    snippets = LocalIndexSource(index).fetch("vector embeddings")
+    assert snippets[0].url.startswith("file://")
+
+
+def test_local_index_research_with_relative_directory(tmp_path, monkeypatch):
+    import services.doc_index as doc_index
+
+    monkeypatch.chdir(tmp_path)
+    Path("docs").mkdir()
+    Path("docs/notes.txt").write_text("Agentic retrieval combines search with summarization.\n")
+    index = DocumentIndex("index")
+    index.ingest(["docs"])
+    monkeypatch.setattr(doc_index, "_INDEX", index)
+
+    summary = local_index_research("agentic retrieval")
+    assert not summary.unanswerable
+    assert summary.sources[0].url.startswith("file://")
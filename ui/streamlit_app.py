@@ -12,6 +12,7 @@ from __future__ import annotations
 
 import os
 import sys
+import uuid
 from pathlib import Path
 
 # Add src/ to Python path so relative imports in src/app.py work correctly
@@ -25,7 +26,8 @@ import streamlit as st
 # Import the workflow builder and runner from the backend
 # These use relative imports, so we import as if we're in the src/ directory
 from app import build_workflow
-from agents.agent_graph import run_graph
+from agents.agent_graph import run_graph_result
+from services.tenancy import QuotaExceededError, RequestContext, resolve_tenant
 
 
 @st.cache_resource
@@ -108,35 +110,43 @@ with center:
     
     run_clicked = st.button("Search insights", type="primary", use_container_width=True)
     
-    # Initialize result state if not present
+    # Initialize result state if not present (a models.ResearchResult once answered)
     if "result" not in st.session_state:
-        st.session_state.result = ""
+        st.session_state.result = None
+
+    # One id per browser session; `?tenant=<name>` selects a tenant configured in TENANT_QUOTAS.
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    tenant = resolve_tenant(st.query_params.get("tenant", ""))
     
     # Handle search button click
     if run_clicked:
         if not query or not query.strip():
             st.warning("Please enter a question to analyze.")
-            st.session_state.result = ""
+            st.session_state.result = None
         else:
             # Get the cached workflow and execute the query
             workflow = get_workflow()
             with st.spinner("Analyzing your question with agentic reasoning..."):
                 try:
-                    st.session_state.result = run_graph(workflow, query.strip())
+                    context = RequestContext(
+                        tenant=tenant,
+                        session_id=st.session_state.session_id,
+                    )
+                    st.session_state.result = run_graph_result(workflow, query.strip(), context=context)
+                except QuotaExceededError as e:
+                    st.warning(f"Usage limit reached for '{e.tenant}'. Please try again later.")
+                    st.session_state.result = None
                 except Exception as e:
                     st.error(f"An error occurred: {str(e)}")
                     st.exception(e)
-                    st.session_state.result = ""
+                    st.session_state.result = None
     
     # Display results
     if st.session_state.result:
         st.markdown("----")
-        result_text = st.session_state.result
-        
-        # Parse the combined result to extract sections
-        parts = result_text.split("=== Oracle Trends ===")
-        web_summary = parts[0].replace("=== Web Research Summary ===", "").strip()
-        oracle_section = parts[1].strip() if len(parts) > 1 else ""
+        result = st.session_state.result
+        web_summary = result.search.text.strip()
         
         # Display Web Research Summary
         if web_summary:
@@ -157,22 +167,20 @@ with center:
                     unsafe_allow_html=True,
                 )
         
-        # Parse and display Oracle Trends with fallback handling
-        if oracle_section:
-            raw_trends = oracle_section.split("\n")
-            raw_trends = [t.strip() for t in raw_trends if t.strip()]
-        else:
-            raw_trends = []
-        
-        non_fallback_trends = [t for t in raw_trends if "(fallback)" not in t]
-        
-        if non_fallback_trends:
+        if result.search.sources:
+            labels = [src.title or src.source for src in result.search.sources]
+            st.caption("Sources: " + ", ".join(dict.fromkeys(labels)))
+
+        # Display Oracle Trends, using the explicit fallback flags on each row
+        real_trends = [row for row in result.trends.rows if not row.fallback]
+
+        if real_trends:
             st.subheader("=== Oracle Trends ===")
-            st.text("\n".join(non_fallback_trends))
-        elif raw_trends:
+            st.text("\n".join(row.render() for row in real_trends))
+        elif result.trends.rows:
             # We got only fallback trends from the DatabaseAgent
-            st.info(f"We weren't able to find Oracle trend data about '{query}'.")
-        # else: if raw_trends is empty or None, render nothing
+            st.info(f"We weren't able to find Oracle trend data about '{result.query}'.")
+        # else: if there are no rows at all, render nothing
         
         st.caption(
             "ResearchFlow AI combines web search, LLM summarization, and Oracle database trends under the hood."